@@ -0,0 +1,250 @@
+"""
+Pytest plugin that collects the performance metrics recorded by the
+integration tests, stores them into a results file and compares them
+against a baseline (a results file from a previous run).
+
+Tests record metrics through the "benchmark_metrics" fixture:
+
+def test_throughput(benchmark_metrics):
+    ...
+    benchmark_metrics.record('sender_throughput', accepted / elapsed, unit='msg/s')
+    benchmark_metrics.record_latency('sender_latency', sender.latency)
+"""
+import json
+import logging
+import os
+import time
+import warnings
+
+import pytest
+
+# Values accepted by the regression option
+FAIL = 'fail'
+WARN = 'warn'
+
+# Latency percentiles recorded by BenchmarkMetrics.record_latency()
+LATENCY_PERCENTILES = (50.0, 99.0, 99.9)
+
+
+class BenchmarkRegressionWarning(UserWarning):
+    pass
+
+
+class BenchmarkMetrics(object):
+    """
+    Metrics recorded by a single test (one instance per test and parameters).
+    """
+    def __init__(self, topology, test, params):
+        self.topology = topology
+        self.test = test
+        self.params = params
+        self.metrics = {}
+
+    @property
+    def key(self):
+        """
+        Key identifying the test results (topology, test id and parameters).
+        :return:
+        """
+        return '%s::%s' % (self.topology, self.test)
+
+    def record(self, name, value, unit=None, higher_is_better=True, tolerance=None):
+        """
+        Records a metric value.
+        :param name: metric name (unique per test)
+        :param value: metric value (None values are ignored)
+        :param unit: unit of the value (informative only)
+        :param higher_is_better: False if the metric regresses when it grows (i.e. latency)
+        :param tolerance: tolerance (percent) overriding the default one for this metric
+        :return:
+        """
+        if value is None:
+            return
+        self.metrics[name] = {'value': value,
+                              'unit': unit,
+                              'higher_is_better': higher_is_better,
+                              'tolerance': tolerance}
+
+    def record_latency(self, name, histogram, unit='s', tolerance=None):
+        """
+        Records the latency percentiles (see LATENCY_PERCENTILES) of the given LatencyHistogram,
+        as "<name>_p<percentile>" metrics.
+        :param name:
+        :param histogram:
+        :param unit:
+        :param tolerance:
+        :return:
+        """
+        for percentile in LATENCY_PERCENTILES:
+            self.record('%s_p%g' % (name, percentile), histogram.percentile(percentile), unit=unit,
+                        higher_is_better=False, tolerance=tolerance)
+
+    def to_dict(self):
+        return {'topology': self.topology,
+                'test': self.test,
+                'params': self.params,
+                'metrics': self.metrics}
+
+    def regressions(self, baseline, tolerance):
+        """
+        Compares the recorded metrics against the baseline ones, returning the list
+        of regressions (as messages). Metrics missing in the baseline are ignored.
+        :param baseline: dictionary (as returned by to_dict()) of the baseline test results
+        :param tolerance: default tolerance (percent)
+        :return:
+        """
+        result = []
+        baseline_metrics = baseline.get('metrics', {})
+        for name, metric in sorted(self.metrics.items()):
+            if name not in baseline_metrics:
+                continue
+
+            expected = baseline_metrics[name]['value']
+            allowed = metric['tolerance'] if metric['tolerance'] is not None else tolerance
+            if metric['higher_is_better']:
+                regressed = metric['value'] < expected * (1 - allowed / 100.0)
+            else:
+                regressed = metric['value'] > expected * (1 + allowed / 100.0)
+
+            if regressed:
+                result.append("%s: %s (baseline: %s, tolerance: %s%%)" % (name, metric['value'], expected, allowed))
+        return result
+
+
+class BenchmarkPlugin(object):
+    """
+    Provides the "benchmark_metrics" fixture, compares the metrics of each test
+    against the baseline (when the test call is reported, so that a regression
+    fails the test itself) and writes the results file at the end of the session.
+    """
+    def __init__(self, topology, results_path=None, baseline_path=None, tolerance=10.0, regression=WARN):
+        """
+        :param topology: name of the topology the tests run against
+        :param results_path: path of the results file to be written (None to not store results)
+        :param baseline_path: path of a results file to compare with (None to not compare)
+        :param tolerance: default tolerance (percent) before a metric is considered a regression
+        :param regression: FAIL or WARN
+        """
+        self.topology = topology
+        self.results_path = results_path
+        self.tolerance = tolerance
+        self.regression = regression
+        self.results = {}
+        self.baseline = {}
+
+        # BenchmarkMetrics of the running tests, keyed by node id
+        self._running = {}
+
+        if baseline_path:
+            with open(baseline_path) as baseline_file:
+                self.baseline = json.load(baseline_file).get('results', {})
+
+    @pytest.fixture
+    def benchmark_metrics(self, request):
+        """
+        Returns the BenchmarkMetrics of the running test.
+        :param request:
+        :return:
+        """
+        callspec = getattr(request.node, 'callspec', None)
+        params = {name: str(value) for name, value in callspec.params.items()} if callspec else {}
+        metrics = BenchmarkMetrics(self.topology, request.node.nodeid, params)
+        self._running[request.node.nodeid] = metrics
+
+        yield metrics
+
+        del self._running[request.node.nodeid]
+        if metrics.metrics:
+            self.results[metrics.key] = metrics.to_dict()
+
+    def check(self, metrics):
+        """
+        Returns the message describing the regressed metrics (None if none regressed
+        or there is no baseline for the test).
+        :param metrics:
+        :return:
+        """
+        if metrics.key not in self.baseline:
+            logging.debug("No baseline for %s" % metrics.key)
+            return None
+
+        regressions = metrics.regressions(self.baseline[metrics.key], self.tolerance)
+        if not regressions:
+            return None
+        return "Performance regression in %s: %s" % (metrics.test, "; ".join(regressions))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        """
+        Compares the metrics recorded by a passed test against the baseline. Regressions
+        turn the test report into a failure (FAIL) or issue a warning (WARN).
+        :param item:
+        :param call:
+        :return:
+        """
+        outcome = yield
+        report = outcome.get_result()
+        metrics = self._running.get(item.nodeid)
+        if report.when != 'call' or not report.passed or metrics is None or not metrics.metrics:
+            return
+
+        message = self.check(metrics)
+        if message is None:
+            return
+
+        logging.warning(message)
+        if self.regression == FAIL:
+            report.outcome = 'failed'
+            report.longrepr = message
+        else:
+            warnings.warn(BenchmarkRegressionWarning(message))
+
+    def pytest_sessionfinish(self, session):
+        if not self.results_path or not self.results:
+            return
+
+        directory = os.path.dirname(self.results_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.results_path, 'w') as results_file:
+            json.dump({'created': time.time(),
+                       'topology': self.topology,
+                       'results': self.results}, results_file, indent=2, sort_keys=True)
+
+
+def add_options(parser):
+    """
+    Adds the command line options used by the benchmark plugin.
+    :param parser:
+    :return:
+    """
+    parser.addoption("--benchmark-results", action="store", required=False, default=None,
+                     help="Path of the JSON file where performance metrics are stored")
+
+    parser.addoption("--benchmark-baseline", action="store", required=False, default=None,
+                     help="Path of a previous results file used as baseline")
+
+    parser.addoption("--benchmark-tolerance", action="store", type=float, required=False, default=10.0,
+                     help="Tolerance (percent) before a metric is considered a regression")
+
+    parser.addoption("--benchmark-regression", action="store", required=False, default=WARN, choices=[WARN, FAIL],
+                     help="Whether to warn or fail when a metric regresses")
+
+
+def register(config, topology):
+    """
+    Registers the benchmark plugin (once) using the command line options.
+    :param config:
+    :param topology:
+    :return:
+    """
+    if config.pluginmanager.has_plugin('iqa_benchmark'):
+        return
+
+    plugin = BenchmarkPlugin(topology,
+                             results_path=config.getoption('benchmark_results'),
+                             baseline_path=config.getoption('benchmark_baseline'),
+                             tolerance=config.getoption('benchmark_tolerance'),
+                             regression=config.getoption('benchmark_regression'))
+    config.pluginmanager.register(plugin, 'iqa_benchmark')
@@ -0,0 +1,295 @@
+"""
+asyncio front-end for the Sender and Receiver clients used with the Edge
+Router topology. Each client still runs its own Proton Container (thread),
+while scenario code awaits on the results from a single event loop.
+"""
+import asyncio
+import functools
+import sys
+
+from proton.reactor import ApplicationEvent, EventInjector
+
+from .receiver import Receiver
+from .sender import Sender
+
+# Sentinel queued once the receiver is done (ends async iteration)
+_DONE = object()
+
+
+def _resolve(future, result=None, exception=None):
+    """
+    Sets the result (or exception) of the given future, if not yet done.
+    Must be called from the event loop thread.
+    :param future:
+    :param result:
+    :param exception:
+    :return:
+    """
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+def _stop_error(sender):
+    """
+    Returns the exception for requests that the given (stopped) sender will never acknowledge.
+    :param sender:
+    :return:
+    """
+    return TimeoutError('Sender timed out') if sender.timed_out else ConnectionError('Sender stopped')
+
+
+def _queue(loop):
+    """
+    Returns an asyncio.Queue bound to the given loop. Before Python 3.10 a queue is bound
+    to the default loop unless one is given (later versions bind it to the running loop).
+    :param loop:
+    :return:
+    """
+    if sys.version_info < (3, 10):
+        return asyncio.Queue(loop=loop)
+    return asyncio.Queue()
+
+
+class _AsyncioSender(Sender):
+    """
+    Sender whose amount of messages to send is increased on demand (through
+    events injected from the asyncio loop thread), resolving a future once
+    each requested batch is acknowledged.
+    """
+    def __init__(self, loop, *args, **kwargs):
+        super(_AsyncioSender, self).__init__(*args, message_count=0, **kwargs)
+        self._loop = loop
+        self._injector = EventInjector()
+        self._requested = 0
+        self._pending = []
+
+    def on_start(self, event):
+        event.container.selectable(self._injector)
+        super(_AsyncioSender, self).on_start(event)
+
+    def request(self, count, future):
+        """
+        Requests count more messages to be sent (thread safe). The future
+        is resolved with the accepted count once they are acknowledged.
+        :param count:
+        :param future:
+        :return:
+        """
+        self._injector.trigger(ApplicationEvent('send_more', subject=(count, future)))
+
+    def close(self):
+        """
+        Requests the sender to be stopped (thread safe).
+        :return:
+        """
+        self._injector.trigger(ApplicationEvent('close_sender'))
+
+    def on_send_more(self, event):
+        count, future = event.subject
+        if self.stopped:
+            self._loop.call_soon_threadsafe(_resolve, future, None, _stop_error(self))
+            return
+        self._requested += count
+        self._pending.append((self._requested, future))
+        self._send_batch(self.sender)
+
+    def on_close_sender(self, event):
+        self.stop_sender()
+
+    def is_done_sending(self):
+        return self.stopped or (self.sent - self.released - self.rejected >= self._requested)
+
+    def on_rejected(self, event):
+        super(_AsyncioSender, self).on_rejected(event)
+        self.verify_sender_done(event)
+
+    def verify_sender_done(self, event):
+        """
+        Resolves the futures of all requests that have been acknowledged
+        (sender remains open for further requests).
+        :param event:
+        :return:
+        """
+        acknowledged = self.accepted + self.rejected
+        while self._pending and self._pending[0][0] <= acknowledged:
+            future = self._pending.pop(0)[1]
+            self._loop.call_soon_threadsafe(_resolve, future, self.accepted)
+
+    def stop_sender(self, sender=None, connection=None):
+        super(_AsyncioSender, self).stop_sender(sender, connection)
+        self._injector.close()
+
+        # Pending requests will never be acknowledged
+        error = _stop_error(self)
+        for _, future in self._pending:
+            self._loop.call_soon_threadsafe(_resolve, future, None, error)
+        self._pending = []
+
+
+class _AsyncioReceiver(Receiver):
+    """
+    Receiver that forwards every message it counts into an asyncio queue.
+    """
+    def __init__(self, loop, queue, *args, **kwargs):
+        super(_AsyncioReceiver, self).__init__(*args, **kwargs)
+        self._loop = loop
+        self._queue = queue
+        self._injector = EventInjector()
+
+    def on_start(self, event):
+        event.container.selectable(self._injector)
+        super(_AsyncioReceiver, self).on_start(event)
+
+    def close(self):
+        """
+        Requests the receiver to be stopped (thread safe).
+        :return:
+        """
+        self._injector.trigger(ApplicationEvent('close_receiver'))
+
+    def on_close_receiver(self, event):
+        self.stop_receiver()
+
+    def on_message(self, event):
+        received = self.received
+        super(_AsyncioReceiver, self).on_message(event)
+
+        # Duplicated messages (ignored by the receiver) are not forwarded
+        if self.received > received:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event.message)
+
+    def stop_receiver(self, receiver=None, connection=None):
+        super(_AsyncioReceiver, self).stop_receiver(receiver, connection)
+        self._injector.close()
+
+
+class _AsyncClient(object):
+    """
+    Common asyncio behavior for the async clients, wrapping a Sender or
+    Receiver (available through the "client" attribute).
+    """
+    def __init__(self, loop):
+        self._loop = loop or asyncio.get_event_loop()
+        self._done = self._loop.create_future()
+        self.client = None
+
+    def _bind(self, client):
+        self.client = client
+        client.add_done_callback(lambda c: self._loop.call_soon_threadsafe(_resolve, self._done, c))
+
+    def start(self):
+        """
+        Starts the underlying client thread.
+        :return:
+        """
+        self.client.start()
+        return self
+
+    async def attached(self, timeout=None):
+        """
+        Waits till the client link is attached.
+        :param timeout:
+        :return: True if link has been attached
+        """
+        return await self._loop.run_in_executor(None, self.client.wait_attached, timeout)
+
+    async def wait(self):
+        """
+        Waits till the client is done (can be used with asyncio.gather).
+        :return: the underlying Sender or Receiver
+        """
+        return await asyncio.shield(self._done)
+
+    async def close(self):
+        """
+        Stops the client and waits till it is done.
+        :return: the underlying Sender or Receiver
+        """
+        if not self.client.stopped:
+            self.client.close()
+        return await self.wait()
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncSender(_AsyncClient):
+    """
+    asyncio front-end for the Sender. The connection is kept open and
+    messages are sent on demand through send().
+
+    Example of usage:
+    async with AsyncSender(url, sender_id='sender') as sender:
+        await sender.send(100)
+    """
+    def __init__(self, url, sender_id, loop=None, **kwargs):
+        super(AsyncSender, self).__init__(loop)
+        self._bind(_AsyncioSender(self._loop, url, sender_id=sender_id, **kwargs))
+
+    async def send(self, count):
+        """
+        Sends the given amount of messages and waits till they are acknowledged.
+        Fails (ConnectionError or TimeoutError) if the sender stops before that.
+        :param count:
+        :return: the total number of accepted messages
+        """
+        future = self._loop.create_future()
+        if self.client.stopped:
+            _resolve(future, None, _stop_error(self.client))
+            return await future
+
+        self.client.request(count, future)
+
+        # Requests issued while the sender is stopping may never be processed
+        await asyncio.wait([future, self._done], return_when=asyncio.FIRST_COMPLETED)
+        if not future.done():
+            _resolve(future, None, _stop_error(self.client))
+        return await future
+
+
+class AsyncReceiver(_AsyncClient):
+    """
+    asyncio front-end for the Receiver. Received messages can be consumed
+    through async iteration, which ends when the receiver is done.
+
+    Example of usage:
+    async with AsyncReceiver(url, message_count=100) as receiver:
+        async for message in receiver:
+            ...
+    """
+    def __init__(self, url, message_count, loop=None, **kwargs):
+        super(AsyncReceiver, self).__init__(loop)
+        self._queue = _queue(self._loop)
+        self._bind(_AsyncioReceiver(self._loop, self._queue, url, message_count, **kwargs))
+        self._done.add_done_callback(lambda _: self._queue.put_nowait(_DONE))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._queue.get()
+        if message is _DONE:
+            # Keep iteration finished for subsequent calls
+            self._queue.put_nowait(_DONE)
+            raise StopAsyncIteration
+        return message
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking call (i.e. a RouterQuery management query) in the default
+    executor, so it can be coordinated with the async clients.
+    :param func:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,104 @@
+"""
+Capacity finder that searches for the maximum sustainable throughput
+(knee) of a messaging path, given a probe that runs a load at a fixed
+offered rate and a service level objective (SLO).
+"""
+import logging
+from collections import namedtuple
+
+# Result of running the offered load at a given rate
+ProbeResult = namedtuple('ProbeResult', ['rate', 'sent', 'received', 'latency', 'timed_out'])
+
+# Outcome of a single step of the search (reason is None when SLO was met)
+ProbeStep = namedtuple('ProbeStep', ['rate', 'result', 'reason'])
+
+# Result of the search: knee is the highest rate meeting the SLO (None if even the lowest rate failed)
+Knee = namedtuple('Knee', ['rate', 'steps'])
+
+
+class Slo(object):
+    """
+    Service level objective used to decide if a probe result is acceptable.
+    """
+    def __init__(self, max_loss=0.0, max_latency=None, percentile=99.0, allow_timeout=False):
+        """
+        :param max_loss: maximum fraction of sent messages that can be lost (0.0 - 1.0)
+        :param max_latency: maximum latency (seconds) at the given percentile (None to ignore latency)
+        :param percentile: latency percentile to be compared with max_latency
+        :param allow_timeout: whether clients are allowed to time out
+        """
+        self.max_loss = max_loss
+        self.max_latency = max_latency
+        self.percentile = percentile
+        self.allow_timeout = allow_timeout
+
+    def breach(self, result):
+        """
+        Returns the reason why the given ProbeResult breaches the SLO or None if it is met.
+        :param result:
+        :return:
+        """
+        if result.timed_out and not self.allow_timeout:
+            return 'timeout'
+
+        lost = result.sent - result.received
+        if result.sent and lost / result.sent > self.max_loss:
+            return 'loss (%d of %d)' % (lost, result.sent)
+
+        if self.max_latency is not None:
+            latency = result.latency.percentile(self.percentile) if result.latency else None
+            if latency is None or latency > self.max_latency:
+                return 'latency p%g = %s' % (self.percentile, latency)
+
+        return None
+
+
+def find_knee(probe, slo, low, high, resolution=0.05, max_steps=16):
+    """
+    Finds the maximum rate (between low and high) that meets the SLO.
+    The rate is doubled (starting at low) till the SLO is breached (or high is reached),
+    then a binary search is performed between the last good and first bad rates till
+    they are within the given resolution (relative to the good rate).
+    :param probe: callable receiving the offered rate and returning a ProbeResult
+    :param slo: Slo instance
+    :param low: initial rate (messages per second)
+    :param high: maximum rate to be probed
+    :param resolution: relative precision of the knee
+    :param max_steps: maximum number of probes
+    :return: Knee instance
+    """
+    steps = []
+
+    def run(rate):
+        result = probe(rate)
+        reason = slo.breach(result)
+        steps.append(ProbeStep(rate, result, reason))
+        logging.info("Probe at %.1f msg/s: %s" % (rate, reason or 'SLO met'))
+        return reason is None
+
+    good, bad = None, None
+
+    # Ramp up
+    rate = low
+    while len(steps) < max_steps:
+        if run(rate):
+            good = rate
+            if rate >= high:
+                return Knee(good, steps)
+            rate = min(rate * 2, high)
+        else:
+            bad = rate
+            break
+
+    if good is None:
+        return Knee(None, steps)
+
+    # Binary search between last good and first bad rates
+    while bad is not None and len(steps) < max_steps and (bad - good) / good > resolution:
+        rate = (good + bad) / 2.0
+        if run(rate):
+            good = rate
+        else:
+            bad = rate
+
+    return Knee(good, steps)
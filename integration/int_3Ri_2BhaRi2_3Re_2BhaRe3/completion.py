@@ -0,0 +1,84 @@
+"""
+Completion tracking shared by the Sender and Receiver clients, so callers
+can block (with a timeout) instead of polling client attributes.
+"""
+import threading
+import logging
+
+
+class Completion(object):
+    """
+    Mixin that tracks when the client link gets attached and when the
+    client is done (stopped), notifying waiting threads and callbacks.
+    Classes using it must call _init_completion() and provide a "stopped" property.
+    """
+    def _init_completion(self):
+        self._state_changed = threading.Condition()
+        self._link_attached = False
+        self._done_callbacks = []
+
+    @property
+    def attached(self):
+        """
+        Returns True if the remote peer has attached the client link.
+        :return:
+        """
+        return self._link_attached
+
+    def _notify_attached(self):
+        """
+        Marks the client link as attached and wakes up waiting threads.
+        :return:
+        """
+        with self._state_changed:
+            self._link_attached = True
+            self._state_changed.notify_all()
+
+    def _notify_done(self):
+        """
+        Wakes up threads waiting for the client to complete and runs the
+        registered done callbacks. Must be called after the client is stopped.
+        :return:
+        """
+        with self._state_changed:
+            callbacks, self._done_callbacks = self._done_callbacks, []
+            self._state_changed.notify_all()
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as ex:
+                logging.error("Error running done callback: %s" % ex)
+
+    def wait_attached(self, timeout=None):
+        """
+        Blocks till the client link is attached, the client stops or the timeout expires.
+        :param timeout: timeout in seconds (None to wait forever)
+        :return: True if link has been attached
+        """
+        with self._state_changed:
+            self._state_changed.wait_for(lambda: self._link_attached or self.stopped, timeout)
+            return self._link_attached
+
+    def wait_done(self, timeout=None):
+        """
+        Blocks till the client is done (completed, timed out or stopped) or the timeout expires.
+        :param timeout: timeout in seconds (None to wait forever)
+        :return: True if client is done
+        """
+        with self._state_changed:
+            return self._state_changed.wait_for(lambda: self.stopped, timeout)
+
+    def add_done_callback(self, callback):
+        """
+        Registers a callback (receiving the client as argument) to be invoked once the
+        client is done. If client is already done, callback is invoked immediately.
+        Callbacks run on the thread that stopped the client.
+        :param callback:
+        :return:
+        """
+        with self._state_changed:
+            if not self.stopped:
+                self._done_callbacks.append(callback)
+                return
+        callback(self)
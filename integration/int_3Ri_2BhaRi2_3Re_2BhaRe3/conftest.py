@@ -1,3 +1,6 @@
+import json
+import logging
+import os
 from typing import Union
 
 import pytest
@@ -10,6 +13,18 @@ from messaging_components.clients import \
 from messaging_components.routers.dispatch.dispatch import Dispatch
 from pytest_iqa.instance import IQAInstance
 
+from integration import benchmark
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.management import RouterQueryPool
+
+# Broker queues (also used by tests exchanging messages through all of them at once)
+BROKER_QUEUES = ['brokeri2.durable.queue', 'brokeri2.nondurable.queue', 'brokere3.durable.queue',
+                 'brokere3.nondurable.queue', 'interior.autolink.durable.queue',
+                 'interior.autolink.nondurable.queue', 'edge.autolink.durable.queue',
+                 'edge.autolink.nondurable.queue']
+
+# Broker pairs (HA) as master and slave
+BROKER_PAIRS = [('Broker.M.I2', 'Broker.S.I2'), ('Broker.M.E3', 'Broker.S.E3')]
+
 
 def pytest_addoption(parser):
     """
@@ -23,6 +38,32 @@ def pytest_addoption(parser):
     parser.addoption("--msg-length", action="append", required=False, default=[1024],
                      help="Message length")
 
+    parser.addoption("--client-swarm", action="store_true", required=False, default=False,
+                     help="Host the integration Sender/Receiver clients in a single reactor thread")
+
+    parser.addoption("--load-processes", action="store", type=int, required=False, default=0,
+                     help="Number of worker processes used to generate sharded load (0 disables it)")
+
+    parser.addoption("--throughput-samples-dir", action="store", required=False, default=None,
+                     help="Directory where per client throughput samples are exported (CSV/JSON)")
+
+    parser.addoption("--capacity-sweep", action="store_true", required=False, default=False,
+                     help="Search for the maximum sustainable throughput of each router path (slow)")
+
+    parser.addoption("--failover-outage", action="store_true", required=False, default=False,
+                     help="Measure the messaging outage while broker fails over/back under continuous traffic")
+
+    benchmark.add_options(parser)
+
+
+def pytest_configure(config):
+    """
+    Registers the benchmark plugin, keying results by this topology (directory name).
+    :param config:
+    :return:
+    """
+    benchmark.register(config, os.path.basename(os.path.dirname(os.path.abspath(__file__))))
+
 
 def pytest_generate_tests(metafunc):
     """
@@ -43,12 +84,6 @@ def pytest_generate_tests(metafunc):
     for router in iqa.routers:
         routers.append(router.node.hostname)
 
-    # Broker queues
-    broker_queues = ['brokeri2.durable.queue', 'brokeri2.nondurable.queue', 'brokere3.durable.queue',
-                     'brokere3.nondurable.queue', 'interior.autolink.durable.queue',
-                     'interior.autolink.nondurable.queue', 'edge.autolink.durable.queue',
-                     'edge.autolink.nondurable.queue']
-
     # Address translation tuple
     address_translation_tuple = [
         ('addremoveprefix.durable.queue', 'brokeri2.durable.queue', 'Broker.M.I2'),
@@ -87,14 +122,16 @@ def pytest_generate_tests(metafunc):
     if 'router_with_broker' in metafunc.fixturenames:
         metafunc.parametrize('router_with_broker', ['Router.I2', 'Router.E3'], indirect=True)
 
-    if 'broker_master' in metafunc.fixturenames:
-        metafunc.parametrize('broker_master', ['Broker.M.I2', 'Broker.M.E3'], indirect=True)
-
-    if 'broker_slave' in metafunc.fixturenames:
-        metafunc.parametrize('broker_slave', ['Broker.S.I2', 'Broker.S.E3'], indirect=True)
+    # Master and slave of the same pair when both are requested
+    if {'broker_master', 'broker_slave'}.issubset(metafunc.fixturenames):
+        metafunc.parametrize('broker_master,broker_slave', BROKER_PAIRS, indirect=True)
+    elif 'broker_master' in metafunc.fixturenames:
+        metafunc.parametrize('broker_master', [master for master, _ in BROKER_PAIRS], indirect=True)
+    elif 'broker_slave' in metafunc.fixturenames:
+        metafunc.parametrize('broker_slave', [slave for _, slave in BROKER_PAIRS], indirect=True)
 
     if 'queue' in metafunc.fixturenames:
-        metafunc.parametrize('queue', broker_queues)
+        metafunc.parametrize('queue', BROKER_QUEUES)
 
     # If all fixture names defined in address_translation_fixtures exist in metafunc.fixturenames
     address_translation_fixtures_count = len([f for f in address_translation_fixtures if f in metafunc.fixturenames])
@@ -325,3 +362,17 @@ def broker_slave(request, iqa):
         broker_hostname = request.param
         return iqa.get_brokers(broker_hostname)[0]
 
+
+@pytest.fixture(scope='session')
+def router_query_pool() -> RouterQueryPool:
+    """
+    Returns the RouterQueryPool shared by all tests in the session, logging the
+    management query latencies once the session is over.
+    :return:
+    """
+    pool = RouterQueryPool()
+    yield pool
+
+    logging.info("Management query latency (reconnects: %d): %s"
+                 % (pool.reconnects, json.dumps(pool.latency_summary(), indent=2)))
+    pool.close()
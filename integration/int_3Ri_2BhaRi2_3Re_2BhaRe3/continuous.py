@@ -0,0 +1,282 @@
+"""
+Clients that keep traffic flowing (re-attaching their links when detached
+by the remote peer) till explicitly stopped, and a timeline of successful
+deliveries used to measure outages caused by a disruption (i.e. broker
+fail-over).
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from proton.reactor import ApplicationEvent, EventInjector
+
+from .receiver import Receiver
+from .sender import Sender
+
+# Largest gap without successes around a disruption: last success before and first
+# success after (None if traffic did not recover), as timestamps, and its duration in ms
+Outage = namedtuple('Outage', ['last_before', 'first_after', 'duration_ms'])
+
+# Throughput (successes per second) before the disruption (average of full buckets),
+# the lowest one after it and the relative dip (0.0 - 1.0)
+ThroughputDip = namedtuple('ThroughputDip', ['baseline', 'lowest', 'dip'])
+
+
+class Timeline(object):
+    """
+    Timestamps (time.time()) of successful deliveries. Timestamps are recorded
+    from the client's reactor thread and must only be analysed after the client is done.
+    """
+    def __init__(self):
+        self.timestamps = array('d')
+
+    def record(self):
+        self.timestamps.append(time.time())
+
+    def outage(self, start, end=None):
+        """
+        Returns the largest gap between consecutive successes, from the last success
+        before start (disruption time) till end (or the last success recorded).
+        :param start:
+        :param end:
+        :return: Outage
+        """
+        timestamps = self.timestamps
+        first = max(bisect_right(timestamps, start) - 1, 0)
+        last = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        window = timestamps[first:last]
+
+        if not window or window[0] > start:
+            return Outage(None, window[0] if window else None, None)
+
+        # Traffic did not recover after the last success before start
+        if len(window) == 1:
+            return Outage(window[0], None, None)
+
+        gap, before, after = max((after - before, before, after) for before, after in zip(window, window[1:]))
+        return Outage(before, after, round(gap * 1000.0, 3))
+
+    def buckets(self, origin, width=1.0, start=None, end=None):
+        """
+        Returns the number of successes per bucket of the given width (seconds), as a dictionary
+        keyed by the bucket index relative to origin (negative before origin).
+        :param origin:
+        :param width:
+        :param start: ignore successes before this timestamp
+        :param end: ignore successes after this timestamp
+        :return:
+        """
+        first = bisect_left(self.timestamps, start) if start is not None else 0
+        last = bisect_right(self.timestamps, end) if end is not None else len(self.timestamps)
+
+        result = {}
+        for timestamp in self.timestamps[first:last]:
+            index = int((timestamp - origin) // width)
+            result[index] = result.get(index, 0) + 1
+        return result
+
+    def throughput_dip(self, origin, end, width=1.0):
+        """
+        Compares the throughput before origin (disruption time) with the lowest throughput
+        observed from origin till end, using buckets of the given width (seconds).
+        :param origin:
+        :param end:
+        :param width:
+        :return: ThroughputDip
+        """
+        buckets = self.buckets(origin, width, end=end)
+        if not self.timestamps:
+            return ThroughputDip(None, None, None)
+
+        # Partial buckets (first one before origin) are ignored when computing the baseline
+        first_full = int((self.timestamps[0] - origin) // width) + 1
+        before = [buckets.get(index, 0) for index in range(first_full, 0)]
+        after = [buckets.get(index, 0) for index in range(0, max(1, int((end - origin) // width)))]
+
+        baseline = sum(before) / (len(before) * width) if before else None
+        lowest = min(after) / width
+        dip = 1.0 - lowest / baseline if baseline else None
+        return ThroughputDip(baseline, lowest, dip)
+
+
+class _Reattach(object):
+    """
+    Timer handler that re-attaches the link of a continuous client.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def on_timer(self, event):
+        if not self.client.stopped:
+            self.client.reattach(event.container)
+
+
+class _Call(object):
+    """
+    Function to be run by the reactor thread of a continuous client (see _ContinuousClient.call()).
+    """
+    def __init__(self, function):
+        self.function = function
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            self.result = self.function()
+        except Exception as ex:
+            self.error = ex
+        finally:
+            self.done.set()
+
+
+class _ContinuousClient(object):
+    """
+    Mixin for clients that re-attach their link (over the same connection)
+    whenever it is detached by the remote peer, till stop() is called.
+    Classes using it must call _init_continuous() and provide a reattach() method.
+    """
+    # Delay (seconds) before re-attaching a detached link
+    REATTACH_DELAY = 0.05
+
+    # Interval (seconds) used to check whether the client ended while waiting for a call
+    CALL_POLL_INTERVAL = 0.5
+
+    def _init_continuous(self):
+        self.address = urlparse(self.url).path[1:]
+        self.timeline = Timeline()
+        self.detached = 0
+        self._injector = EventInjector()
+        self._reattach_handler = _Reattach(self)
+
+    def stop(self):
+        """
+        Requests the client to be stopped (thread safe).
+        :return:
+        """
+        self._injector.trigger(ApplicationEvent('stop_client'))
+
+    def call(self, function):
+        """
+        Runs the given function on the reactor thread of the client and returns its result
+        (thread safe), so state mutated by the reactor can be read while the client runs.
+        Once the client is done, the function is run by the calling thread.
+        :param function:
+        :return:
+        """
+        call = _Call(function)
+        if not self.stopped:
+            self._injector.trigger(ApplicationEvent('call_client', subject=call))
+            # Client may end before the call is processed
+            while not call.done.wait(self.CALL_POLL_INTERVAL):
+                if not self.is_alive():
+                    break
+
+        if not call.done.is_set():
+            call.run()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def on_call_client(self, event):
+        event.subject.run()
+
+    def _schedule_reattach(self, event):
+        if self.stopped:
+            return
+        self.detached += 1
+        event.container.schedule(self.REATTACH_DELAY, self._reattach_handler)
+
+    def on_link_error(self, event):
+        self._schedule_reattach(event)
+
+    def on_link_closing(self, event):
+        self._schedule_reattach(event)
+
+
+class ContinuousSender(_ContinuousClient, Sender):
+    """
+    Sender that keeps sending (at the given rate) till stopped, recording
+    when each message is accepted.
+    """
+    def __init__(self, url, sender_id, rate, **kwargs):
+        super(ContinuousSender, self).__init__(url, message_count=0, sender_id=sender_id, rate=rate, **kwargs)
+        self._init_continuous()
+
+    def on_start(self, event):
+        event.container.selectable(self._injector)
+        super(ContinuousSender, self).on_start(event)
+
+    def reattach(self, container):
+        self.create_link(container, self.connection, address=self.address)
+
+    def on_accepted(self, event):
+        super(ContinuousSender, self).on_accepted(event)
+        self.timeline.record()
+
+    def on_stop_client(self, event):
+        self.stop_sender()
+
+    def refused_counters(self):
+        """
+        Returns (thread safe) the number of deliveries refused by the peer (released,
+        modified or rejected) and the number of refused sequences not yet re-sent.
+        :return:
+        """
+        return self.call(lambda: (self.released + self.modified + self.rejected, len(self.refused_sequences)))
+
+    def stop_sender(self, sender=None, connection=None):
+        super(ContinuousSender, self).stop_sender(sender, connection)
+        self._injector.close()
+
+
+class ContinuousReceiver(_ContinuousClient, Receiver):
+    """
+    Receiver that keeps receiving till stopped, recording when each
+    (non duplicated) message arrives.
+    """
+    def __init__(self, url, **kwargs):
+        super(ContinuousReceiver, self).__init__(url, message_count=0, ignore_dups=True, **kwargs)
+        self._init_continuous()
+
+    def on_start(self, event):
+        event.container.selectable(self._injector)
+        super(ContinuousReceiver, self).on_start(event)
+
+    def reattach(self, container):
+        self.create_link(container, self.connection, address=self.address)
+
+    def on_message(self, event):
+        received = self.received
+        super(ContinuousReceiver, self).on_message(event)
+        if self.received > received:
+            self.timeline.record()
+
+    def on_stop_client(self, event):
+        self.stop_receiver()
+
+    def stop_receiver(self, receiver=None, connection=None):
+        super(ContinuousReceiver, self).stop_receiver(receiver, connection)
+        self._injector.close()
+
+    def sequence_counters(self, sender=None):
+        """
+        Returns the lost and duplicated message counts (summed across all senders).
+        When the sender is given, sequences of deliveries it had refused (released, modified
+        or rejected by the router) and not yet re-sent are not counted as lost, and the
+        number of refused deliveries is also returned.
+        Counters are taken by the reactor threads of the clients, so it is safe to call
+        this method while they are running.
+        :param sender: ContinuousSender
+        :return:
+        """
+        counters = self.call(lambda: {'lost': sum(tracker.lost for tracker in self.sequences.values()),
+                                      'duplicates': sum(tracker.duplicates for tracker in self.sequences.values())})
+        if sender is not None:
+            refused, not_resent = sender.refused_counters()
+            counters['lost'] = max(counters['lost'] - not_resent, 0)
+            counters['refused'] = refused
+        return counters
@@ -0,0 +1,173 @@
+"""
+Convergence probe used to measure how long an edge router takes to reattach
+to the interior routers and carry traffic again after being restarted.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from .continuous import ContinuousReceiver, ContinuousSender
+from .snapshot import TopologySnapshot
+
+# Times (seconds) measured from the edge router start: till its uplink connection is
+# opened again (time_to_reattach) and till the first probe message is delivered
+# (time_to_first_delivery). None if it did not happen.
+# topology_changes lists (timestamp, interior router, lastTopoChange before, after).
+Convergence = namedtuple('Convergence', ['edge', 'time_to_reattach', 'time_to_first_delivery',
+                                         'topology_changes', 'polls'])
+
+
+class ConvergenceProbe(threading.Thread):
+    """
+    While an edge router is restarted, polls concurrently (every interval seconds)
+    the nodes of all interior routers and the connections of the edge router,
+    and keeps a low rate probe sender (through the edge router) delivering
+    messages to a receiver attached to an interior router.
+
+    Call mark_stopped() right after the edge router is stopped and mark_started() right
+    before it is started (so the start latency is measured as well). The probe sender
+    relies on the Proton reconnect (default backoff) to reconnect to the edge router,
+    so time to first delivery includes the reconnect delay.
+    """
+    def __init__(self, edge, interiors, pool, receiver_router, address, interval=0.1, rate=10, timeout=300):
+        """
+        :param edge: edge router being restarted
+        :param interiors: interior routers
+        :param pool: RouterQueryPool
+        :param receiver_router: router where the probe receiver is attached
+        :param address: address used by the probe sender and receiver
+        :param interval: polling interval in seconds
+        :param rate: probe messages per second
+        :param timeout: timeout (seconds) for the probe clients
+        """
+        super(ConvergenceProbe, self).__init__()
+        self.edge = edge
+        self.interiors = list(interiors)
+        self.pool = pool
+        self.interval = interval
+        self.stopped_at = None
+        self.started_at = None
+        self.reattached_at = None
+        self.topology_changes = []
+        self.polls = 0
+        self._last_topology_change = {}
+        self._finished = threading.Event()
+
+        self._entities = {router.node.hostname: ('node',) for router in self.interiors}
+        self._entities[edge.node.hostname] = ('connection',)
+
+        self.receiver = ContinuousReceiver(self._url(receiver_router, address), timeout=timeout,
+                                           container_id='convergence-receiver-%s' % edge.node.hostname)
+        self.sender = ContinuousSender(self._url(edge, address), rate=rate, timeout=timeout,
+                                       sender_id='convergence-sender-%s' % edge.node.hostname)
+
+    @staticmethod
+    def _url(router, address):
+        return "amqp://%s:%s/%s" % (router.node.get_ip(), router.port, address)
+
+    def start(self):
+        """
+        Starts the probe clients (receiver is attached first) and the polling thread.
+        If a client cannot be attached, the clients already started are stopped.
+        :return:
+        """
+        started = []
+        try:
+            for name, client in (('receiver', self.receiver), ('sender', self.sender)):
+                client.start()
+                started.append(client)
+                if not client.wait_attached(client.timeout_secs):
+                    raise RuntimeError("Probe %s not attached" % name)
+        except Exception:
+            for client in reversed(started):
+                client.stop()
+                client.join()
+            raise
+        super(ConvergenceProbe, self).start()
+
+    def mark_stopped(self):
+        self.stopped_at = time.time()
+
+    def mark_started(self):
+        self.started_at = time.time()
+
+    def run(self):
+        while not self._finished.is_set():
+            self._poll()
+            self._finished.wait(self.interval)
+
+    def _poll(self):
+        """
+        Takes a snapshot with the interior nodes and edge connections, tracking
+        topology changes and the time the edge uplink is opened after the edge is started.
+        :return:
+        """
+        snapshot = TopologySnapshot.capture(self.interiors + [self.edge], self.pool, self._entities)
+        self.polls += 1
+
+        for router in self.interiors:
+            nodes = snapshot.get(router.node.hostname, 'node')
+            for node in nodes or ():
+                if node.nextHop != '(self)':
+                    continue
+                last = self._last_topology_change.get(router.node.hostname)
+                if last is not None and last != node.lastTopoChange:
+                    self.topology_changes.append((snapshot.timestamp, router.node.hostname, last, node.lastTopoChange))
+                self._last_topology_change[router.node.hostname] = node.lastTopoChange
+
+        # Snapshots taken (even partially) before the edge router was started are ignored
+        if self.started_at is None or self.reattached_at is not None or snapshot.timestamp < self.started_at:
+            return
+
+        # Edge uplink connections (to interior routers) have the "edge" role
+        connections = snapshot.get(self.edge.node.hostname, 'connection') or ()
+        if any(c.role == 'edge' and getattr(c, 'opened', True) for c in connections):
+            self.reattached_at = snapshot.timestamp
+            logging.debug("%s reattached" % self.edge.node.hostname)
+
+    def first_delivery(self):
+        """
+        Returns the timestamp of the first probe message delivered after the edge router has
+        been started (None if none yet). Must only be called after probe is finished.
+        :return:
+        """
+        if self.started_at is None:
+            return None
+        for timestamp in self.receiver.timeline.timestamps:
+            if timestamp >= self.started_at:
+                return timestamp
+        return None
+
+    @property
+    def reattached(self):
+        return self.reattached_at is not None
+
+    @property
+    def delivering(self):
+        """
+        Returns True if a probe message has been accepted after the edge router has been started.
+        :return:
+        """
+        accepted = self.sender.timeline.timestamps
+        return self.started_at is not None and len(accepted) > 0 and accepted[-1] >= self.started_at
+
+    def finish(self):
+        """
+        Stops polling and the probe clients, returning the measured convergence.
+        :return: Convergence
+        """
+        self._finished.set()
+        self.join()
+
+        self.sender.stop()
+        self.sender.join()
+        self.receiver.stop()
+        self.receiver.join()
+
+        first_delivery = self.first_delivery()
+        return Convergence(self.edge.node.hostname,
+                           self.reattached_at - self.started_at if self.reattached else None,
+                           first_delivery - self.started_at if first_delivery is not None else None,
+                           self.topology_changes,
+                           self.polls)
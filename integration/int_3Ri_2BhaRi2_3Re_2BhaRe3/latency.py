@@ -0,0 +1,173 @@
+"""
+Compact latency histogram that can be used by the Edge Router topology clients.
+"""
+
+import json
+import math
+
+
+class LatencyHistogram(object):
+    """
+    Log-bucketed histogram of latency values (in seconds).
+    Each power of two is split into a fixed number of sub buckets, so the
+    relative error of any reported value is bounded by 2 ** (1 / sub_buckets),
+    while memory only grows with the range of recorded values (not with the
+    number of samples).
+    """
+    PERCENTILES = (50.0, 99.0, 99.9)
+
+    def __init__(self, sub_buckets=16, min_value=1e-6):
+        self.sub_buckets = sub_buckets
+        self.min_value = min_value
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        """
+        Returns the bucket index for the given value.
+        :param value:
+        :return:
+        """
+        if value <= self.min_value:
+            return 0
+        return int(math.log2(value / self.min_value) * self.sub_buckets)
+
+    def _bucket_value(self, bucket):
+        """
+        Returns the upper bound of the given bucket index.
+        :param bucket:
+        :return:
+        """
+        return self.min_value * 2 ** ((bucket + 1) / self.sub_buckets)
+
+    def record(self, value):
+        """
+        Records the given latency value (in seconds).
+        :param value:
+        :return:
+        """
+        value = max(value, 0.0)
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile):
+        """
+        Returns the value at the given percentile (0-100) or None if
+        nothing has been recorded.
+        :param percentile:
+        :return:
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, math.ceil(self.count * percentile / 100.0))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self._bucket_value(bucket), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        """
+        Returns the mean of all recorded values or None if nothing has been recorded.
+        :return:
+        """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def summary(self):
+        """
+        Returns a dictionary with count, min, mean, max and the
+        pre-defined percentiles (p50, p99 and p99.9).
+        :return:
+        """
+        result = {'count': self.count, 'min': self.min, 'mean': self.mean, 'max': self.max}
+        for percentile in self.PERCENTILES:
+            result['p%s' % ('%g' % percentile)] = self.percentile(percentile)
+        return result
+
+    def merge(self, other):
+        """
+        Adds all values recorded by the other histogram into this one.
+        Both histograms must use the same bucket layout.
+        :param other:
+        :return:
+        """
+        if (other.sub_buckets, other.min_value) != (self.sub_buckets, self.min_value):
+            raise ValueError('Unable to merge histograms with different bucket layouts')
+
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def to_dict(self):
+        """
+        Returns a dictionary representation of the histogram (JSON serializable).
+        :return:
+        """
+        return {'sub_buckets': self.sub_buckets,
+                'min_value': self.min_value,
+                'buckets': {str(bucket): count for bucket, count in self.buckets.items()},
+                'count': self.count,
+                'total': self.total,
+                'min': self.min,
+                'max': self.max,
+                'summary': self.summary()}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a histogram from a dictionary generated by to_dict().
+        :param data:
+        :return:
+        """
+        histogram = cls(sub_buckets=data['sub_buckets'], min_value=data['min_value'])
+        histogram.buckets = {int(bucket): count for bucket, count in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+def merge_by_source(histograms_by_source):
+    """
+    Merges a list of dictionaries (source -> LatencyHistogram), like the ones
+    kept by each Receiver, into a single dictionary.
+    :param histograms_by_source:
+    :return:
+    """
+    merged = {}
+    for histograms in histograms_by_source:
+        for source, histogram in histograms.items():
+            if source not in merged:
+                merged[source] = LatencyHistogram(histogram.sub_buckets, histogram.min_value)
+            merged[source].merge(histogram)
+    return merged
+
+
+def to_json(histograms_by_source, **kwargs):
+    """
+    Returns a JSON document with the given dictionary (source -> LatencyHistogram).
+    :param histograms_by_source:
+    :param kwargs: extra arguments passed to json.dumps
+    :return:
+    """
+    return json.dumps({source: histogram.to_dict() for source, histogram in histograms_by_source.items()},
+                      **kwargs)
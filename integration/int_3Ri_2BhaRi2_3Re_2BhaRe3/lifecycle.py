@@ -0,0 +1,104 @@
+"""
+Bulk service operations (stop, start, restart) executed concurrently on a
+set of components (routers and brokers) of the Edge Router topology.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from messaging_abstract.component import ServiceStatus
+
+# Outcome of an operation on a single component: started is the time (time.time()) the
+# operation began, elapsed its duration in seconds, status the service status right after
+# it and error the exception raised (None if succeeded)
+OperationResult = namedtuple('OperationResult', ['component', 'operation', 'started', 'elapsed', 'status', 'error'])
+
+STOP = 'stop'
+START = 'start'
+RESTART = 'restart'
+
+# Service status expected after each operation
+EXPECTED_STATUS = {STOP: ServiceStatus.STOPPED, START: ServiceStatus.RUNNING, RESTART: ServiceStatus.RUNNING}
+
+
+def _execute(component, operation):
+    """
+    Executes the given operation on the component service (restart is a stop followed by a start).
+    :param component:
+    :param operation:
+    :return:
+    """
+    if operation in (STOP, RESTART):
+        component.service.stop()
+    if operation in (START, RESTART):
+        component.service.start()
+
+
+def run_concurrently(components, operation, synchronized=False, timeout=None):
+    """
+    Runs the given operation on all components concurrently (one thread per component).
+    :param components: routers and/or brokers
+    :param operation: STOP, START or RESTART
+    :param synchronized: if True, all threads wait on a barrier so that operations
+                         are issued at the same time
+    :param timeout: maximum time (seconds) to wait on the barrier
+    :return: list of OperationResult (same order as components)
+    """
+    if operation not in EXPECTED_STATUS:
+        raise ValueError("Invalid operation: %s" % operation)
+
+    components = list(components)
+    if not components:
+        return []
+
+    barrier = threading.Barrier(len(components), timeout=timeout) if synchronized else None
+
+    def run(component):
+        name = component.node.hostname
+        if barrier is not None:
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError as ex:
+                logging.error("Barrier broken before %s %s" % (operation, name))
+                return OperationResult(name, operation, time.time(), 0.0, None, ex)
+
+        started = time.time()
+        begin = time.monotonic()
+        error, status = None, None
+        try:
+            _execute(component, operation)
+            status = component.service.status()
+        except Exception as ex:
+            logging.error("Unable to %s %s: %s" % (operation, name, ex))
+            error = ex
+        elapsed = time.monotonic() - begin
+
+        logging.debug("%s %s took %.3f seconds" % (operation, name, elapsed))
+        return OperationResult(name, operation, started, elapsed, status, error)
+
+    with ThreadPoolExecutor(max_workers=len(components)) as executor:
+        return list(executor.map(run, components))
+
+
+def stop_all(components, synchronized=False, timeout=None):
+    return run_concurrently(components, STOP, synchronized, timeout)
+
+
+def start_all(components, synchronized=False, timeout=None):
+    return run_concurrently(components, START, synchronized, timeout)
+
+
+def restart_all(components, synchronized=False, timeout=None):
+    return run_concurrently(components, RESTART, synchronized, timeout)
+
+
+def failed(results):
+    """
+    Returns the results whose operation raised an error or did not leave the
+    component service in the expected status.
+    :param results: list of OperationResult
+    :return:
+    """
+    return [r for r in results if r.error is not None or r.status != EXPECTED_STATUS[r.operation]]
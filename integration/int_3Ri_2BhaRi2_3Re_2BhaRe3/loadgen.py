@@ -0,0 +1,218 @@
+"""
+Multi-process load generator for the Edge Router topology.
+Sender and Receiver workloads are split into shards, each shard running
+in its own worker process (hosted by a ClientSwarm) and reporting its
+results back through a pipe.
+"""
+import os
+import logging
+import multiprocessing
+import time
+from collections import namedtuple
+from multiprocessing.connection import wait
+
+from .latency import LatencyHistogram
+from .sender import Sender
+from .swarm import ClientSwarm
+
+# A client to be instantiated in a worker process. The client class must be importable
+# and kwargs must be picklable (i.e. urls instead of router instances).
+Workload = namedtuple('Workload', ['client_class', 'kwargs'])
+
+
+def shard_routers(routers, shards):
+    """
+    Splits the given routers (i.e. from iqa.get_routers()) into the
+    given number of slices (round robin).
+    :param routers:
+    :param shards:
+    :return:
+    """
+    return [routers[index::shards] for index in range(shards) if routers[index::shards]]
+
+
+def client_results(client):
+    """
+    Returns a dictionary (picklable) with the results of the given Sender or Receiver.
+    :param client:
+    :return:
+    """
+    if isinstance(client, Sender):
+        return {'kind': 'sender',
+                'id': client.sender_id,
+                'url': client.url,
+                'total': client.total,
+                'sent': client.sent,
+                'accepted': client.accepted,
+                'released': client.released,
+                'rejected': client.rejected,
+                'modified': client.modified,
+                'settled': client.settled,
+                'timed_out': client.timed_out,
+                'latency': client.latency.to_dict()}
+
+    return {'kind': 'receiver',
+            'id': client.container_id,
+            'url': client.url,
+            'total': client.total,
+            'received': client.received,
+            'timed_out': client.timed_out,
+            'latency': {source: histogram.to_dict() for source, histogram in client.latency.items()}}
+
+
+def _run_shard(conn, workloads, cpu, ready_timeout):
+    """
+    Worker process entry point. Runs all workloads in a ClientSwarm, notifies
+    when all links have been attached and sends back the results once done.
+    :param conn:
+    :param workloads:
+    :param cpu: cpu to pin the worker process to (if supported), pinning failures are not fatal
+    :param ready_timeout: maximum time to wait for each link to be attached
+    :return:
+    """
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError as ex:
+            logging.warning("Unable to pin shard to cpu %d: %s" % (cpu, ex))
+
+    clients = [workload.client_class(**workload.kwargs) for workload in workloads]
+    swarm = ClientSwarm(clients)
+    swarm.start()
+
+    for client in clients:
+        client.wait_attached(ready_timeout)
+    conn.send(('ready', None))
+
+    swarm.join()
+    conn.send(('results', [client_results(client) for client in clients]))
+    conn.close()
+
+
+class LoadShardPool(object):
+    """
+    Starts shards of workloads in worker processes and collects their results.
+    """
+    READY_TIMEOUT = 60
+
+    def __init__(self, pin_cpus=True):
+        self.pin_cpus = pin_cpus
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+
+        # Shards are pinned (round robin) to the cpus this process is allowed to run on
+        self._cpus = sorted(os.sched_getaffinity(0)) if pin_cpus and hasattr(os, 'sched_getaffinity') else None
+
+    def start(self, workloads, wait_ready=True):
+        """
+        Starts a worker process running the given list of Workload instances
+        and (optionally) waits till all of its links have been attached.
+        :param workloads:
+        :param wait_ready: whether to wait for the shard links to be attached
+        :return: the shard index
+        """
+        index = len(self._workers)
+        cpu = self._cpus[index % len(self._cpus)] if self._cpus else None
+
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_shard, args=(child_conn, workloads, cpu, self.READY_TIMEOUT),
+                                        name='load-shard-%d' % index, daemon=True)
+        process.start()
+        child_conn.close()
+        self._workers.append((process, parent_conn))
+
+        if wait_ready:
+            self.wait_ready([index])
+        return index
+
+    def start_all(self, shards):
+        """
+        Starts one worker process per list of Workload instances and then waits
+        till the links of all of them have been attached.
+        :param shards: list of lists of Workload instances
+        :return: the shard indexes
+        """
+        indexes = [self.start(workloads, wait_ready=False) for workloads in shards]
+        self.wait_ready(indexes)
+        return indexes
+
+    def wait_ready(self, indexes, timeout=None):
+        """
+        Waits (up to a single deadline) till the given shards notify that their links are attached.
+        :param indexes:
+        :param timeout: defaults to READY_TIMEOUT
+        :return: True if all shards are ready
+        """
+        deadline = time.monotonic() + (timeout or self.READY_TIMEOUT)
+        pending = {self._workers[index][1]: index for index in indexes}
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for conn in wait(list(pending), remaining):
+                index = pending.pop(conn)
+                try:
+                    if conn.recv()[0] != 'ready':
+                        logging.warning("Unexpected message from shard %d" % index)
+                except EOFError:
+                    logging.error("Shard %d exited before its links were attached" % index)
+
+        for index in pending.values():
+            logging.warning("Shard %d did not attach its links within %ds" % (index, timeout or self.READY_TIMEOUT))
+        return not pending
+
+    def join(self, timeout=None):
+        """
+        Waits for all worker processes and returns a list (one element per shard)
+        with the results of each client (see client_results). Shards that did not
+        report results within the timeout (or crashed) are returned as None.
+        :param timeout: single deadline (seconds) for all shards (None waits indefinitely)
+        :return:
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        results = []
+        for index, (process, conn) in enumerate(self._workers):
+            shard_results = None
+            try:
+                # A shard that was slow to get ready may still have its 'ready' message queued
+                while conn.poll(remaining()):
+                    kind, payload = conn.recv()
+                    if kind == 'results':
+                        shard_results = payload
+                        break
+            except EOFError:
+                logging.error("Shard %d exited without sending its results" % index)
+
+            process.join(remaining())
+            if process.is_alive():
+                logging.error("Shard %d still running, terminating it" % index)
+                process.terminate()
+            results.append(shard_results)
+
+        return results
+
+
+def merge_results_latency(results):
+    """
+    Merges the latency histograms from all receivers in the given results (as returned
+    by LoadShardPool.join) into a dictionary (source -> LatencyHistogram).
+    :param results:
+    :return:
+    """
+    merged = {}
+    for shard_results in results:
+        for result in shard_results or []:
+            if result['kind'] != 'receiver':
+                continue
+            for source, data in result['latency'].items():
+                histogram = LatencyHistogram.from_dict(data)
+                if source in merged:
+                    merged[source].merge(histogram)
+                else:
+                    merged[source] = histogram
+    return merged
@@ -0,0 +1,143 @@
+"""
+Pool of router management clients (RouterQuery) shared across the tests
+of the Edge Router topology, so routers can be polled repeatedly without
+setting up a new management connection for every query.
+"""
+import logging
+import threading
+import time
+
+from messaging_components.routers.dispatch.management import RouterQuery
+
+from .latency import LatencyHistogram
+
+
+class _PooledRouterQuery(object):
+    """
+    Drop-in replacement for a RouterQuery bound to a router, whose queries
+    (i.e. node(), connector()) are executed through the pool.
+    """
+    def __init__(self, pool, router):
+        self._pool = pool
+        self.router = router
+
+    def __getattr__(self, entity):
+        def query(*args, **kwargs):
+            return self._pool.query(self.router, entity, *args, **kwargs)
+        return query
+
+
+class RouterQueryPool(object):
+    """
+    Keeps one RouterQuery per router (keyed by host and port), reusing it for all
+    queries. A RouterQuery opens its management connection when it is created and
+    keeps it open, so reusing it saves a connection per query (reconnects counts
+    the connections opened again after a failure). If a query fails, the RouterQuery
+    is discarded and the query is retried (retries times) with a new one, so routers
+    that have been restarted are reconnected.
+
+    The latency of each query is recorded per router and entity (query method).
+    Queries to the same router are serialized, queries to different routers can
+    run concurrently.
+    """
+    def __init__(self, retries=1):
+        """
+        :param retries: number of times a failed query is retried with a new RouterQuery
+        """
+        self.retries = retries
+        self._queries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.reconnects = 0
+
+    @staticmethod
+    def _key(router):
+        return router.node.get_ip(), router.port
+
+    def _router_lock(self, key):
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def client(self, router):
+        """
+        Returns an object that can be used as the RouterQuery of the given router.
+        :param router:
+        :return:
+        """
+        return _PooledRouterQuery(self, router)
+
+    def query(self, router, entity, *args, **kwargs):
+        """
+        Executes the given RouterQuery method (entity) against the router.
+        :param router:
+        :param entity: RouterQuery method name (i.e. 'node', 'router', 'connector')
+        :param args:
+        :param kwargs:
+        :return: the RouterQuery method result
+        """
+        key = self._key(router)
+        with self._router_lock(key):
+            attempt = 0
+            while True:
+                try:
+                    # Connection (i.e. while the router is restarting) is retried as well
+                    query = self._queries.get(key)
+                    if query is None:
+                        query = RouterQuery(host=key[0], port=key[1], router=router)
+                        self._queries[key] = query
+
+                    started = time.monotonic()
+                    result = getattr(query, entity)(*args, **kwargs)
+                except Exception as ex:
+                    self._discard(key)
+                    if attempt >= self.retries:
+                        raise
+                    attempt += 1
+                    self.reconnects += 1
+                    logging.warning("Query %s to %s:%s failed, reconnecting: %s" % (entity, key[0], key[1], ex))
+                    continue
+
+                self._record(key, entity, time.monotonic() - started)
+                return result
+
+    def _record(self, key, entity, elapsed):
+        histograms = self.latency.setdefault('%s:%s' % key, {})
+        if entity not in histograms:
+            histograms[entity] = LatencyHistogram()
+        histograms[entity].record(elapsed)
+
+    def _discard(self, key):
+        """
+        Removes (closing it, when supported) the RouterQuery stored for the given key.
+        :param key:
+        :return:
+        """
+        query = self._queries.pop(key, None)
+        close = getattr(query, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception as ex:
+                logging.debug("Error closing RouterQuery: %s" % ex)
+
+    def latency_summary(self):
+        """
+        Returns a dictionary (host:port -> entity -> latency summary) with the query latencies.
+        :return:
+        """
+        return {router: {entity: histogram.summary() for entity, histogram in histograms.items()}
+                for router, histograms in self.latency.items()}
+
+    def close(self):
+        """
+        Discards all RouterQuery instances.
+        :return:
+        """
+        with self._lock:
+            keys = list(self._queries)
+        for key in keys:
+            with self._router_lock(key):
+                self._discard(key)
@@ -3,21 +3,54 @@ A custom receiver implementation that can be used, as an alternative,
 for testing Edge Router topology.
 """
 import threading
+import time
 import logging
 
 from iqa_common.utils.timeout import TimeoutCallback
 from proton.handlers import MessagingHandler
 from proton.reactor import Container, DurableSubscription
 
+from .completion import Completion
+from .latency import LatencyHistogram
+from .sampling import ThroughputSampler
+from .sender import Sender
+from .sequence import SequenceTracker, DUPLICATE
 
-class Receiver(MessagingHandler, threading.Thread):
+
+class _DeferredCredit(object):
+    """
+    Timer handler that grants one credit to a slow consumer receiver.
+    """
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def on_timer(self, event):
+        if not self.receiver.stopped and self.receiver.receiver:
+            self.receiver.receiver.flow(1)
+
+
+class Receiver(MessagingHandler, Completion, threading.Thread):
     """
     Receiver implementation of a Proton client that run as a thread.
     """
+    # Maximum number of integrity failures kept for further inspection
+    INTEGRITY_FAILURE_SAMPLES = 10
+
     def __init__(self, url, message_count, timeout=0, container_id=None, durable=False, save_messages=False,
-                 ignore_dups=False, auto_accept=True, auto_settle=True):
-        super(Receiver, self).__init__(auto_accept=auto_accept, auto_settle=auto_settle)
+                 ignore_dups=False, auto_accept=True, auto_settle=True, sample_interval=0,
+                 verify_integrity=False, prefetch=10, credit_window=0, credit_batch=0, accept_batch=0,
+                 accept_interval=0, processing_delay=0, consume_rate=0):
+        # Slow consumer emulation is based on deferred credit (one message at a time)
+        consume_interval = processing_delay or (1.0 / consume_rate if consume_rate > 0 else 0)
+        if consume_interval > 0:
+            prefetch, credit_window, credit_batch = 0, 1, 1
+
+        # When accepting in batches, messages are not accepted individually by the MessagingHandler
+        batch_accept = auto_accept and (accept_batch > 0 or accept_interval > 0)
+        super(Receiver, self).__init__(prefetch=prefetch, auto_accept=auto_accept and not batch_accept,
+                                       auto_settle=auto_settle)
         threading.Thread.__init__(self)
+        self._init_completion()
         self.url = url
         self.receiver = None
         self.connection = None
@@ -35,6 +68,47 @@ class Receiver(MessagingHandler, threading.Thread):
         self._stopped = False
         self._timed_out = False
 
+        # End to end latency histograms per source (based on timestamp stamped by the Sender)
+        self.latency = {}
+
+        # Throughput samples taken every sample_interval seconds (if greater than 0)
+        self.sample_interval = sample_interval
+        self.sampler = None
+
+        # Sequence trackers per sender (user id), used to report loss, duplicates and reordering
+        self.sequences = {}
+
+        # Validates the body checksum (stamped by the Sender) of each message on arrival
+        self.verify_integrity = verify_integrity
+        self.integrity_passed = 0
+        self.integrity_failed = 0
+        self.integrity_failures = []
+
+        # Manual credit control (used when prefetch is 0): credit_window is granted when link is
+        # created and replenished every credit_batch messages (defaults to half of the window)
+        self.prefetch = prefetch
+        self.credit_window = credit_window if not prefetch else 0
+        self.credit_batch = credit_batch or max(1, self.credit_window // 2)
+        self._consumed = 0
+
+        # Slow consumer emulation: credit for the next message is only granted after
+        # consume_interval seconds (processing_delay or 1 / consume_rate), without blocking the reactor
+        self.consume_interval = consume_interval
+        self._next_credit = 0
+        self._credit_handler = _DeferredCredit(self)
+
+        # Batched disposition: deliveries are accepted (and settled) together every
+        # accept_batch messages and/or every accept_interval seconds
+        self.batch_accept = batch_accept
+        self.accept_batch = accept_batch
+        self.accept_interval = accept_interval
+        self._unaccepted = []
+        self._accept_task = None
+
+        # Set when the connection is shared with other clients (i.e. hosted by a ClientSwarm),
+        # so only the link is closed when receiver stops
+        self.shared_connection = False
+
     @property
     def timed_out(self):
         return self._timed_out
@@ -61,12 +135,85 @@ class Receiver(MessagingHandler, threading.Thread):
         :param event:
         :return:
         """
+        self.create_link(event.container, self.url, name=self.container_id)
+
+    def create_link(self, container, context, address=None, name=None, handler=None):
+        """
+        Creates the receiver link using the given context (an url or an existing connection).
+        :param container:
+        :param context:
+        :param address:
+        :param name:
+        :param handler: handler for link events (defaults to the container's handler)
+        :return:
+        """
         subs_opts = None
         if self.durable:
             subs_opts = DurableSubscription()
-        self.receiver = event.container.create_receiver(self.url, name=self.container_id, options=subs_opts)
+        self.receiver = container.create_receiver(context, source=address, name=name,
+                                                  handler=handler, options=subs_opts)
         self.connection = self.receiver.connection
 
+        if self.credit_window > 0:
+            self.receiver.flow(self.credit_window)
+
+        if self.batch_accept and self.accept_interval > 0:
+            self._accept_task = container.schedule(self.accept_interval, self)
+
+        if self.sample_interval > 0:
+            self.sampler = ThroughputSampler(self, ('received',), self.sample_interval)
+            self.sampler.start(container)
+
+    def _replenish_credit(self, receiver):
+        """
+        Grants credit back to the sender once credit_batch messages have been consumed
+        (only when credit is controlled manually).
+        :param receiver:
+        :return:
+        """
+        if self.credit_window <= 0:
+            return
+
+        if self.consume_interval > 0:
+            # Credit is granted at a fixed pace, so consume rate does not depend on network latency
+            now = time.monotonic()
+            self._next_credit = max(now, self._next_credit + self.consume_interval)
+            self.container.schedule(self._next_credit - now, self._credit_handler)
+            return
+
+        self._consumed += 1
+        if self._consumed >= self.credit_batch:
+            receiver.flow(self._consumed)
+            self._consumed = 0
+
+    def accept_pending(self):
+        """
+        Accepts (and settles) all deliveries waiting for a batched disposition.
+        :return:
+        """
+        unaccepted, self._unaccepted = self._unaccepted, []
+        for delivery in unaccepted:
+            self.accept(delivery)
+
+    def on_timer(self, event):
+        """
+        Accepts pending deliveries every accept_interval seconds.
+        :param event:
+        :return:
+        """
+        if self._accept_task is None:
+            return
+        self.accept_pending()
+        self._accept_task = event.container.schedule(self.accept_interval, self)
+
+    def on_link_opened(self, event):
+        """
+        Notifies that receiver link has been attached
+        :param event:
+        :return:
+        """
+        self._notify_attached()
+
     def on_message(self, event):
         """
         Processes an incoming message
@@ -74,16 +221,29 @@ class Receiver(MessagingHandler, threading.Thread):
         :return:
         """
 
-        # Ignore received message from user id
-        if self.ignore_dups and event.message.user_id and event.message.id and \
-                event.message.user_id in self.last_received_id and \
-                self.last_received_id[event.message.user_id] == event.message.id:
+        self._replenish_credit(event.receiver)
+        if self.batch_accept and not event.delivery.settled:
+            self._unaccepted.append(event.delivery)
+            if 0 < self.accept_batch <= len(self._unaccepted):
+                self.accept_pending()
+
+        sequence_status = self._track_sequence(event.message)
+
+        # Ignore duplicated message from user id (based on sequence number if available,
+        # otherwise on the last message id received)
+        if self.ignore_dups and (sequence_status == DUPLICATE or (
+                sequence_status is None and event.message.user_id and event.message.id and
+                event.message.user_id in self.last_received_id and
+                self.last_received_id[event.message.user_id] == event.message.id)):
             logging.warning('Ignoring duplicated message [id: %s]' % event.message.id)
             return
 
         logging.debug("%s - received message" % self.container_id)
         self.last_received_id[event.message.user_id] = event.message.id
         self.received += 1
+        self._record_latency(event.message)
+        if self.verify_integrity:
+            self._verify_integrity(event.message)
 
         # Saving received message for further validation
         if self.save_messages:
@@ -93,6 +253,67 @@ class Receiver(MessagingHandler, threading.Thread):
         if self.is_done_receiving():
             self.stop_receiver(event.receiver, event.connection)
 
+    def _track_sequence(self, message):
+        """
+        Tracks the sequence number stamped by the Sender (if any) for the
+        user id of the given message.
+        :param message:
+        :return: the tracker result or None if message has no sequence number
+        """
+        properties = message.properties
+        if not properties or Sender.SEQUENCE_PROPERTY not in properties:
+            return None
+
+        if message.user_id not in self.sequences:
+            self.sequences[message.user_id] = SequenceTracker()
+        return self.sequences[message.user_id].track(properties[Sender.SEQUENCE_PROPERTY],
+                                                     properties.get(Sender.RESENT_PROPERTY, False))
+
+    def sequence_summary(self):
+        """
+        Returns a dictionary (user id -> counters) with lost, duplicated,
+        reordered, late and re-sent messages per sender.
+        :return:
+        """
+        return {user_id: tracker.summary() for user_id, tracker in self.sequences.items()}
+
+    def _record_latency(self, message):
+        """
+        Records the end to end latency for the given message, if it has
+        been stamped by the Sender.
+        :param message:
+        :return:
+        """
+        properties = message.properties
+        if not properties or Sender.SENT_TIMESTAMP_PROPERTY not in properties:
+            return
+
+        source = properties.get(Sender.SOURCE_PROPERTY)
+        if source not in self.latency:
+            self.latency[source] = LatencyHistogram()
+        self.latency[source].record(time.time() - properties[Sender.SENT_TIMESTAMP_PROPERTY])
+
+    def _verify_integrity(self, message):
+        """
+        Compares the CRC32 of the message body with the checksum stamped by
+        the Sender, updating the integrity counters. Only a small sample of the
+        failures is kept.
+        :param message:
+        :return:
+        """
+        properties = message.properties or {}
+        expected = properties.get(Sender.CHECKSUM_PROPERTY)
+        actual = Sender.body_checksum(message.body) if isinstance(message.body, str) else None
+
+        if expected is not None and expected == actual:
+            self.integrity_passed += 1
+            return
+
+        self.integrity_failed += 1
+        logging.warning('Integrity check failed [id: %s, expected: %s, actual: %s]' % (message.id, expected, actual))
+        if len(self.integrity_failures) < Receiver.INTEGRITY_FAILURE_SAMPLES:
+            self.integrity_failures.append({'id': message.id, 'expected': expected, 'actual': actual})
+
     def timeout_stop_receiver(self):
         self._timed_out = True
         self.stop_receiver()
@@ -112,6 +333,15 @@ class Receiver(MessagingHandler, threading.Thread):
             self.timeout_handler.interrupt()
 
         self._stopped = True
+        if self.sampler:
+            self.sampler.stop()
+
+        # Accept everything received so far before closing the link
+        if self._accept_task is not None:
+            self._accept_task.cancel()
+            self._accept_task = None
+        self.accept_pending()
+
         rec = receiver or self.receiver
         con = connection or self.connection
 
@@ -121,9 +351,11 @@ class Receiver(MessagingHandler, threading.Thread):
 
         if rec:
             rec.close()
-        if con:
+        if con and not self.shared_connection:
             con.close()
 
+        self._notify_done()
+
     def is_done_receiving(self):
         """
         Validates if all messages have been received (when expecting a
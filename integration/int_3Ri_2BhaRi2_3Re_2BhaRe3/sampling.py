@@ -0,0 +1,126 @@
+"""
+Time-series throughput sampling for the Sender and Receiver clients.
+"""
+import csv
+import json
+import time
+from array import array
+
+
+class ThroughputSampler(object):
+    """
+    Periodically snapshots the given counters of a client into a preallocated
+    ring buffer (oldest samples are overwritten once capacity is reached).
+
+    Samples are taken by a timer scheduled on the client's Proton Container,
+    so they run on the reactor thread and are consistent with the counters
+    it updates.
+    """
+    def __init__(self, client, counters, interval=0.1, capacity=4096):
+        self.client = client
+        self.counters = tuple(counters)
+        self.interval = interval
+        self.capacity = capacity
+        self._timestamps = array('d', [0.0]) * capacity
+        self._values = [array('q', [0]) * capacity for _ in self.counters]
+        self._index = 0
+        self._count = 0
+        self._task = None
+
+    def start(self, container):
+        """
+        Takes the initial sample and schedules the following ones on the given container.
+        :param container:
+        :return:
+        """
+        self._sample()
+        self._task = container.schedule(self.interval, self)
+
+    def stop(self):
+        """
+        Cancels the pending timer and takes a final sample.
+        :return:
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._sample()
+
+    def on_timer(self, event):
+        if self._task is None:
+            return
+        self._sample()
+        self._task = event.container.schedule(self.interval, self)
+
+    def _sample(self):
+        """
+        Stores current counter values at the next position of the ring buffer.
+        :return:
+        """
+        index = self._index
+        self._timestamps[index] = time.time()
+        for values, counter in zip(self._values, self.counters):
+            values[index] = getattr(self.client, counter)
+        self._index = (index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def samples(self):
+        """
+        Returns the stored samples (oldest first) as a list of tuples
+        (timestamp, {counter: value}).
+        :return:
+        """
+        start = (self._index - self._count) % self.capacity
+        result = []
+        for offset in range(self._count):
+            index = (start + offset) % self.capacity
+            result.append((self._timestamps[index],
+                           {counter: values[index] for counter, values in zip(self.counters, self._values)}))
+        return result
+
+    def rates(self):
+        """
+        Returns the rate (per second) of each counter between consecutive samples,
+        as a list of dictionaries with the sample timestamp, the elapsed time since
+        the first sample and one "<counter>_rate" entry per counter.
+        :return:
+        """
+        samples = self.samples()
+        if not samples:
+            return []
+
+        first = samples[0][0]
+        result = []
+        for (prev_ts, prev_values), (ts, values) in zip(samples, samples[1:]):
+            elapsed = ts - prev_ts
+            if elapsed <= 0:
+                continue
+            rate = {'timestamp': ts, 'elapsed': ts - first}
+            for counter in self.counters:
+                rate['%s_rate' % counter] = (values[counter] - prev_values[counter]) / elapsed
+            result.append(rate)
+        return result
+
+    def to_csv(self, path):
+        """
+        Writes the rates to the given CSV file.
+        :param path:
+        :return:
+        """
+        fields = ['timestamp', 'elapsed'] + ['%s_rate' % counter for counter in self.counters]
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.rates())
+
+    def to_json(self, path):
+        """
+        Writes the interval, the raw samples and the rates to the given JSON file.
+        :param path:
+        :return:
+        """
+        with open(path, 'w') as json_file:
+            json.dump({'interval': self.interval,
+                       'samples': [dict(values, timestamp=ts) for ts, values in self.samples()],
+                       'rates': self.rates()}, json_file, indent=2)
@@ -3,17 +3,24 @@ Custom sender implementation that can be used with the Edge Router topology.
 """
 
 import threading
+import time
 import uuid
 import logging
 import math
+import zlib
+from collections import deque
 
 from iqa_common.utils.timeout import TimeoutCallback
 from proton import Message, Delivery
 from proton._handlers import MessagingHandler
 from proton._reactor import Container, AtLeastOnce
 
+from .completion import Completion
+from .latency import LatencyHistogram
+from .sampling import ThroughputSampler
 
-class Sender(MessagingHandler, threading.Thread):
+
+class Sender(MessagingHandler, Completion, threading.Thread):
     """
     Simple sender class to be used with Edge Router testing
     """
@@ -21,11 +28,36 @@ class Sender(MessagingHandler, threading.Thread):
     message_body = None
     lock = threading.Lock()
 
+    # Application properties used to measure end to end latency
+    SOURCE_PROPERTY = 'iqa.source'
+    SENT_TIMESTAMP_PROPERTY = 'iqa.sent_timestamp'
+
+    # Application property holding a per sender sequence number (starting at 0)
+    SEQUENCE_PROPERTY = 'iqa.seq'
+
+    # Application property telling receivers that the sequence number is being re-sent
+    RESENT_PROPERTY = 'iqa.resent'
+
+    # Application property holding the CRC32 of the message body (verified by receivers)
+    CHECKSUM_PROPERTY = 'iqa.crc32'
+
+    # Counters sampled when a sample interval is given
+    SAMPLED_COUNTERS = ('sent', 'accepted', 'released', 'modified')
+
+    # Length of the message ids generated by each sender (prefix + hex counter)
+    ID_LENGTH = 32
+
+    # Message bodies built once and shared across senders, keyed by (message size, body strategy)
+    payload_cache = {}
+
     def __init__(self, url, message_count, sender_id, message_size=1024, timeout=0,
                  user_id=None, proton_option=AtLeastOnce(), use_unique_body=False,
-                 auto_accept=True, auto_settle=True):
+                 auto_accept=True, auto_settle=True, batch_size=0, rate=0, source=None,
+                 sample_interval=0, checksum=False):
         super(Sender, self).__init__(auto_accept=auto_accept, auto_settle=auto_settle)
         threading.Thread.__init__(self)
+        self._init_completion()
+        self.auto_settle = auto_settle
         self.url = url
         self.total = message_count
         self.sender_id = sender_id
@@ -39,27 +71,77 @@ class Sender(MessagingHandler, threading.Thread):
         self.settled = 0
         self._timed_out = False
         self.container = None
-        self.message_size = message_size
-
-        # If requested to use an unique, then generate it
-        self.use_unique_body = use_unique_body
-        if use_unique_body:
-            Sender.lock.acquire()
-            self._generate_message_id_and_body()
-            Sender.lock.release()
 
         # If not a valid message size given, enforce default value of 1024
         try:
-            int(self.message_size)
+            self.message_size = int(message_size)
         except ValueError:
             self.message_size = 1024
 
+        # Message ids are composed by a random prefix (per sender) and a sequential counter,
+        # so that an uuid4 does not need to be generated for every message
+        self._id_prefix = uuid.uuid4().hex[:24]
+        self._id_counter = 0
+
+        # Bodies that are not unique start with the message id (fixed length) followed by a
+        # padding built once per sender, so the whole body is not rebuilt for every message
+        self._padding = self._build_body(self._id_prefix, max(self.message_size - Sender.ID_LENGTH, 0))
+
+        # Monotonically increasing sequence number stamped into each message. Sequence numbers of
+        # deliveries refused by the peer (released, modified or rejected) are reused by the next
+        # messages sent (flagged as re-sent), so receivers do not count refused deliveries as lost.
+        self.sequence = 0
+        self._refused_sequences = deque()
+
+        # If requested to use an unique, then generate it (or reuse a cached one)
+        self.use_unique_body = use_unique_body
+        if use_unique_body:
+            self.message_body = self.get_payload(self.message_size, 'unique', self._next_message_id())
+
         self.timeout_secs = timeout
         self.timeout_handler = None
 
         self.user_id = user_id.encode('utf-8') if user_id else ('sender.%s' % sender_id).encode('utf-8')
         self.proton_option = proton_option
-        self.tracker = []
+
+        # Unsettled deliveries keyed by delivery tag (entries are evicted once settled).
+        # Values are the intended send time (used to compute latency when an outcome is received)
+        # and the sequence number stamped into the message.
+        self.tracker = {}
+        self.max_unsettled = 0
+        self._message = Message(user_id=self.user_id)
+
+        # Application properties stamped into every message (send timestamp is used by
+        # receivers to measure end to end latency per source)
+        self.source = source or sender_id
+        self._properties = {Sender.SOURCE_PROPERTY: self.source}
+        self._message.properties = self._properties
+
+        # Checksum of the message body, only stamped when requested (receivers verifying integrity),
+        # computed once when using an unique body
+        self.checksum = checksum
+        self._body_checksum = Sender.body_checksum(self.message_body) if use_unique_body and checksum else None
+
+        # Maximum number of messages sent per on_sendable callback (0 means the whole credit window)
+        self.batch_size = batch_size
+        self.sendable_callbacks = 0
+        self.max_batch_sent = 0
+        self._send_task = None
+        self._send_deadline = None
+
+        # Target rate (messages per second). When set, messages are sent following a fixed schedule
+        # and latency is measured against the intended send time (so that stalls are not hidden).
+        self.rate = rate
+        self._schedule_start = None
+        self.latency = LatencyHistogram()
+
+        # Throughput samples taken every sample_interval seconds (if greater than 0)
+        self.sample_interval = sample_interval
+        self.sampler = None
+
+        # Set when the connection is shared with other clients (i.e. hosted by a ClientSwarm),
+        # so only the link is closed when sender stops
+        self.shared_connection = False
 
         # Internal variable to control whether or not sender was stopped
         self._stopped = False
@@ -95,9 +177,34 @@ class Sender(MessagingHandler, threading.Thread):
         :return:
         """
         logging.debug("entered on_start()")
-        self.sender = event.container.create_sender(self.url, options=self.proton_option)
+        self.create_link(event.container, self.url)
+
+    def create_link(self, container, context, address=None, name=None, handler=None):
+        """
+        Creates the sender link using the given context (an url or an existing connection).
+        :param container:
+        :param context:
+        :param address:
+        :param name:
+        :param handler: handler for link events (defaults to the container's handler)
+        :return:
+        """
+        self.sender = container.create_sender(context, target=address, name=name,
+                                              handler=handler, options=self.proton_option)
         self.connection = self.sender.connection
 
+        if self.sample_interval > 0:
+            self.sampler = ThroughputSampler(self, Sender.SAMPLED_COUNTERS, self.sample_interval)
+            self.sampler.start(container)
+
+    def on_link_opened(self, event):
+        """
+        Notifies that sender link has been attached
+        :param event:
+        :return:
+        """
+        self._notify_attached()
+
     def is_done_sending(self):
         """
         Returns True if all expected messages have been sent or if sender has timed out.
@@ -105,61 +212,262 @@ class Sender(MessagingHandler, threading.Thread):
         """
         return self.stopped or (self.total > 0 and (self.sent - self.released - self.rejected == self.total))
 
+    @classmethod
+    def get_payload(cls, message_size, strategy, seed):
+        """
+        Returns the cached message body for the given size and strategy,
+        building it (based on the given seed) if not yet available.
+        :param message_size:
+        :param strategy:
+        :param seed:
+        :return:
+        """
+        key = (message_size, strategy)
+        with cls.lock:
+            if key not in cls.payload_cache:
+                logging.debug("Generating body [size: %d, strategy: %s]" % key)
+                cls.payload_cache[key] = cls._build_body(seed, message_size)
+                # Kept for compatibility with code that reads the class attribute
+                cls.message_body = cls.payload_cache[key]
+            return cls.payload_cache[key]
+
+    @staticmethod
+    def _build_body(seed, message_size):
+        """
+        Builds a body with the given size by repeating the seed.
+        :param seed:
+        :param message_size:
+        :return:
+        """
+        multiplier = math.ceil(message_size / len(seed))
+        return (seed * multiplier)[:message_size]
+
+    @staticmethod
+    def body_checksum(body):
+        """
+        Returns the CRC32 of the given (string) message body.
+        :param body:
+        :return:
+        """
+        return zlib.crc32(body.encode('utf-8'))
+
+    def _next_message_id(self):
+        """
+        Returns the next message id for this sender.
+        :return:
+        """
+        self._id_counter += 1
+        return '%s%08x' % (self._id_prefix, self._id_counter)
+
     def _generate_message_id_and_body(self) -> list:
         """
-        Generates a message id and body using UUID and the
-        pre-defined message size.
+        Generates a message id and body. When using an unique body, the
+        cached payload is returned, otherwise body is the message id followed
+        by the sender padding (up to the pre-defined message size).
         :return: a list with msg_id and msg_body
         :rtype: list
         """
-        msg_id = str(uuid.uuid4()).replace('-', '')
-        msg_body = Sender.message_body
+        msg_id = self._next_message_id()
 
-        if not self.use_unique_body or not msg_body:
-            logging.debug("Generarting body")
-            # 32 is the length for uuid4 clean string
-            multiplier = math.ceil(self.message_size / 32)
-            msg_body = (msg_id * multiplier)[:self.message_size]
-            if self.use_unique_body:
-                Sender.message_body = msg_body
+        if self.use_unique_body:
+            msg_body = self.message_body
+        else:
+            msg_body = msg_id + self._padding if self.message_size >= Sender.ID_LENGTH \
+                else msg_id[:self.message_size]
 
         return [msg_id, msg_body]
 
     def on_sendable(self, event):
         """
-        Sends messages if sender has credits and not yet done sending
+        Sends as many messages as the available credit allows (limited by
+        batch_size, when set), if sender is not yet done sending the
         expected amount of messages.
         :param event:
         :return:
         """
-        if event.sender.credit > 0 and not self.is_done_sending():
+        self._send_batch(event.sender)
+
+    def on_timer(self, event):
+        """
+        Resumes sending when a batch was interrupted by batch_size while
+        credit was still available (no new on_sendable would be triggered)
+        or when the next message is due (if a target rate has been set).
+        :param event:
+        :return:
+        """
+        self._send_task = None
+        self._send_deadline = None
+        self._send_batch(self.sender)
+
+    def _schedule_send(self, delay):
+        """
+        Schedules a call to _send_batch after the given delay (in seconds), unless
+        an earlier one is already pending.
+        :param delay:
+        :return:
+        """
+        deadline = time.monotonic() + delay
+        if self._send_task is not None:
+            if self._send_deadline <= deadline:
+                return
+            self._send_task.cancel()
+        self._send_deadline = deadline
+        self._send_task = self.container.schedule(delay, self)
+
+    def _intended_send_time(self, now):
+        """
+        Returns the intended send time for the next message. When no target rate
+        is defined, the current time is returned. If the next message is not yet due,
+        returns None and schedules the sender to be resumed when it is.
+        :param now:
+        :return:
+        """
+        if self.rate <= 0:
+            return now
+
+        if self._schedule_start is None:
+            self._schedule_start = now
+
+        intended = self._schedule_start + self.sent / self.rate
+        if intended > now:
+            self._schedule_send(intended - now)
+            return None
+        return intended
+
+    def _send_batch(self, sender):
+        """
+        Sends up to batch_size messages (or the whole credit window if batch_size
+        is 0) in a single reactor callback. If a target rate has been defined, only
+        messages whose intended send time has been reached are sent.
+        :param sender:
+        :return:
+        """
+        if not sender or sender.credit <= 0 or self.is_done_sending():
+            logging.debug("Sender has no credit or it is already done sending/timed-out.")
+            return
+
+        self.sendable_callbacks += 1
+        batch_sent = 0
+
+        # A single Message instance is reused, as it is encoded when sent
+        msg = self._message
+
+        while sender.credit > 0 and not self.is_done_sending():
+            if 0 < self.batch_size <= batch_sent:
+                # Let other events be processed before consuming remaining credit
+                self._schedule_send(0)
+                break
+
+            intended = self._intended_send_time(time.monotonic())
+            if intended is None:
+                break
 
             # Get both id and body
             (msg_id, msg_body) = self._generate_message_id_and_body()
-            msg = Message(id=msg_id, user_id=self.user_id, body=msg_body)
-
-            self.tracker.append(event.sender.send(msg))
+            msg.id = msg_id
+            msg.body = msg_body
+            self._properties[Sender.SENT_TIMESTAMP_PROPERTY] = time.time()
+            resent = bool(self._refused_sequences)
+            sequence = self._next_sequence()
+            self._properties[Sender.SEQUENCE_PROPERTY] = sequence
+            self._properties[Sender.RESENT_PROPERTY] = resent
+            if self.checksum:
+                self._properties[Sender.CHECKSUM_PROPERTY] = self._body_checksum if self.use_unique_body \
+                    else Sender.body_checksum(msg_body)
+
+            delivery = sender.send(msg)
+            self.tracker[delivery.tag] = (intended, sequence)
             self.sent += 1
+            batch_sent += 1
             logging.debug("Message sent: %s" % msg_id)
-        else:
-            logging.debug("Sender has no credit or it is already done sending/timed-out.")
+
+        self.max_batch_sent = max(self.max_batch_sent, batch_sent)
+        self.max_unsettled = max(self.max_unsettled, len(self.tracker))
+
+    @property
+    def messages_per_callback(self):
+        """
+        Returns the average number of messages sent per on_sendable callback.
+        :return:
+        """
+        if not self.sendable_callbacks:
+            return 0.0
+        return self.sent / self.sendable_callbacks
+
+    @property
+    def unsettled(self):
+        """
+        Returns the number of deliveries sent that are not yet settled.
+        :return:
+        """
+        return len(self.tracker)
+
+    def _next_sequence(self):
+        """
+        Returns the sequence number for the next message, reusing the oldest
+        sequence number refused by the peer (if any).
+        :return:
+        """
+        if self._refused_sequences:
+            return self._refused_sequences.popleft()
+        sequence = self.sequence
+        self.sequence += 1
+        return sequence
+
+    @property
+    def refused_sequences(self):
+        """
+        Returns the sequence numbers of refused deliveries that have not been re-sent
+        (yet), so that loss calculations can exclude them.
+        :return:
+        """
+        return list(self._refused_sequences)
+
+    def _refuse(self, delivery):
+        """
+        Keeps the sequence number of a delivery refused by the peer so it is reused.
+        :param delivery:
+        :return:
+        """
+        entry = self.tracker.get(delivery.tag)
+        if entry is not None:
+            self._refused_sequences.append(entry[1])
+        self._untrack(delivery)
+
+    def _untrack(self, delivery, outcome=True):
+        """
+        Removes the given delivery from the tracker once it is done, which happens
+        when it gets settled or when an outcome is received and auto_settle is set.
+        :param delivery:
+        :param outcome: whether the delivery has received an outcome (or just got settled)
+        :return:
+        """
+        if outcome and not self.auto_settle:
+            return
+        self.tracker.pop(delivery.tag, None)
 
     def on_accepted(self, event):
         """
-        Increases the accepted count (if delivery not yet in tracker list).
+        Increases the accepted count (if delivery not yet in tracker).
         :param event:
         :return:
         """
-        if event.delivery not in self.tracker:
+        entry = self.tracker.get(event.delivery.tag)
+        if entry is None:
             logging.debug('Ignoring confirmation for other deliveries - %s' % event.delivery.tag)
+        else:
+            self.latency.record(time.monotonic() - entry[0])
         self.accepted += 1
+        self._untrack(event.delivery)
         self.verify_sender_done(event)
 
     def on_modified(self, event):
         self.modified += 1
+        self._refuse(event.delivery)
 
     def on_settled(self, event):
         self.settled += 1
+        self._untrack(event.delivery, outcome=False)
 
     def on_released(self, event):
         # from qpid_dispatch system tests:
@@ -168,6 +476,7 @@ class Sender(MessagingHandler, threading.Thread):
         if event.delivery.remote_state == Delivery.MODIFIED:
             return self.on_modified(event)
         self.released += 1
+        self._refuse(event.delivery)
         logging.debug('Message released - %s' % event.delivery.tag)
 
     def on_rejected(self, event):
@@ -177,6 +486,7 @@ class Sender(MessagingHandler, threading.Thread):
         :return:
         """
         self.rejected += 1
+        self._refuse(event.delivery)
         logging.debug('Message rejected - %s' % event.delivery.tag)
 
     def verify_sender_done(self, event):
@@ -208,13 +518,21 @@ class Sender(MessagingHandler, threading.Thread):
             self.timeout_handler.interrupt()
 
         self._stopped = True
+        if self._send_task is not None:
+            self._send_task.cancel()
+            self._send_task = None
+        if self.sampler:
+            self.sampler.stop()
+
         sdr = sender or self.sender
         con = connection or self.connection
         if sdr:
             sdr.close()
-        if con:
+        if con and not self.shared_connection:
             con.close()
 
+        self._notify_done()
+
     @property
     def stopped(self):
         """
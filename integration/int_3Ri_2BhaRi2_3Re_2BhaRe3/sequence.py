@@ -0,0 +1,112 @@
+"""
+Receiver side tracking of the sequence numbers stamped by each Sender,
+used to tell message loss from duplication and reordering.
+"""
+
+# Results returned by SequenceTracker.track()
+NEW = 'new'
+DUPLICATE = 'duplicate'
+REORDERED = 'reordered'
+LATE = 'late'
+RESENT = 'resent'
+
+
+class SequenceTracker(object):
+    """
+    Tracks the sequence numbers received from a single sender using a
+    sliding window bitmap, so memory is constant regardless of the number
+    of messages.
+
+    Bit N of the bitmap tells whether sequence (highest - N) has been received.
+    Sequences skipped when a higher one arrives are counted as missing till
+    they arrive (reordered). Sequences older than the window cannot be
+    classified (duplicate or reordered) and are counted as late; as long as
+    sequences are missing, a late arrival is assumed to be one of them.
+
+    Sequences re-sent by the sender (after the delivery was refused by the peer)
+    fill their gap like a reordered or late one, but are counted as resent, so
+    re-sends do not inflate the reordered and late counters.
+    """
+    def __init__(self, window=1024, first_sequence=0):
+        """
+        :param window: number of sequences (bits) kept in the bitmap
+        :param first_sequence: first sequence expected (None to start from the first one received)
+        """
+        self.window = window
+        self._mask = (1 << window) - 1
+        self._bitmap = 0
+        self.highest = None if first_sequence is None else first_sequence - 1
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.missing = 0
+        self.late = 0
+        self.resent = 0
+
+    def track(self, sequence, resent=False):
+        """
+        Tracks the given sequence number.
+        :param sequence:
+        :param resent: whether the sequence is being re-sent by the sender
+        :return: NEW, DUPLICATE, REORDERED, LATE or RESENT
+        """
+        self.received += 1
+
+        if self.highest is None:
+            self.highest = sequence - 1
+
+        if sequence > self.highest:
+            shift = sequence - self.highest
+            self.missing += shift - 1
+            # A jump beyond the window leaves no previous sequence within it
+            if shift >= self.window:
+                self._bitmap = 1
+            else:
+                self._bitmap = ((self._bitmap << shift) | 1) & self._mask
+            self.highest = sequence
+            return NEW
+
+        offset = self.highest - sequence
+        if offset >= self.window:
+            if self.missing > 0:
+                self.missing -= 1
+            if resent:
+                self.resent += 1
+                return RESENT
+            self.late += 1
+            return LATE
+
+        bit = 1 << offset
+        if self._bitmap & bit:
+            self.duplicates += 1
+            return DUPLICATE
+
+        self._bitmap |= bit
+        self.missing -= 1
+        if resent:
+            self.resent += 1
+            return RESENT
+        self.reordered += 1
+        return REORDERED
+
+    @property
+    def lost(self):
+        """
+        Returns the number of sequences that have been skipped and not received
+        (so far) within the window.
+        :return:
+        """
+        return self.missing
+
+    def summary(self):
+        """
+        Returns a dictionary with all counters.
+        :return:
+        """
+        return {'highest': self.highest,
+                'received': self.received,
+                'lost': self.lost,
+                'duplicates': self.duplicates,
+                'reordered': self.reordered,
+                'late': self.late,
+                'resent': self.resent}
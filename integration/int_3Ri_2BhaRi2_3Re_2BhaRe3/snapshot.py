@@ -0,0 +1,107 @@
+"""
+Point in time view of the management entities of many routers, fetched
+concurrently through the RouterQueryPool.
+"""
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+# Management entities of a single router: entities maps each entity (RouterQuery method)
+# to a tuple with the returned records, errors maps entities that could not be fetched
+# to the error message
+RouterSnapshot = namedtuple('RouterSnapshot', ['name', 'entities', 'errors'])
+
+
+class TopologySnapshot(object):
+    """
+    Immutable, timestamped snapshot of the given management entities of a set of
+    routers (keyed by router hostname, i.e. "Router.I1").
+    """
+    # Entities fetched by default
+    ENTITIES = ('router', 'node', 'connector', 'config_autolink')
+
+    __slots__ = ('_timestamp', '_elapsed', '_routers')
+
+    def __init__(self, timestamp, elapsed, routers):
+        """
+        :param timestamp: time (time.time()) the snapshot has been requested
+        :param elapsed: seconds it took to fetch all entities
+        :param routers: dictionary of router name -> RouterSnapshot
+        """
+        object.__setattr__(self, '_timestamp', timestamp)
+        object.__setattr__(self, '_elapsed', elapsed)
+        object.__setattr__(self, '_routers', MappingProxyType(dict(routers)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TopologySnapshot is immutable")
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def routers(self):
+        """
+        Read only mapping of router name -> RouterSnapshot.
+        :return:
+        """
+        return self._routers
+
+    def __getitem__(self, name):
+        return self._routers[name]
+
+    def get(self, name, entity):
+        """
+        Returns the records of the given entity for the given router (None if not fetched).
+        :param name: router name
+        :param entity:
+        :return:
+        """
+        return self._routers[name].entities.get(entity)
+
+    @property
+    def errors(self):
+        """
+        Returns a dictionary of router name -> errors, for routers that could not be fully queried.
+        :return:
+        """
+        return {name: dict(router.errors) for name, router in self._routers.items() if router.errors}
+
+    @classmethod
+    def capture(cls, routers, pool, entities=ENTITIES, max_workers=None):
+        """
+        Fetches the given entities from all routers concurrently (one thread per router).
+        Each entity is still a separate management query, sent over the pooled connection
+        of the router.
+        :param routers: router instances (i.e. iqa.get_routers())
+        :param pool: RouterQueryPool
+        :param entities: RouterQuery methods to be invoked, or a dictionary of router name -> methods
+                         (when different entities are needed from each router)
+        :param max_workers: maximum number of routers queried at the same time (defaults to all)
+        :return: TopologySnapshot
+        """
+        routers = list(routers)
+        timestamp = time.time()
+        started = time.monotonic()
+
+        def fetch(router):
+            fetched, errors = {}, {}
+            names = entities.get(router.node.hostname, ()) if isinstance(entities, dict) else entities
+            for entity in names:
+                try:
+                    fetched[entity] = tuple(pool.query(router, entity))
+                except Exception as ex:
+                    logging.debug("Unable to fetch %s from %s: %s" % (entity, router.node.hostname, ex))
+                    errors[entity] = str(ex)
+            return RouterSnapshot(router.node.hostname, MappingProxyType(fetched), MappingProxyType(errors))
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(routers), 1)) as executor:
+            snapshots = list(executor.map(fetch, routers))
+
+        return cls(timestamp, time.monotonic() - started, {snapshot.name: snapshot for snapshot in snapshots})
@@ -0,0 +1,148 @@
+"""
+Hosts many Sender and Receiver clients (links) in a single Proton Container,
+running in one thread, to be used with the Edge Router topology.
+"""
+import threading
+import logging
+from urllib.parse import urlsplit
+
+from proton.handlers import MessagingHandler
+from proton.reactor import Container
+
+from .sender import Sender
+
+
+class _ClientTimeout(object):
+    """
+    Timer handler that stops a hosted client once its timeout expires.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def on_timer(self, event):
+        if self.client.stopped:
+            return
+        if isinstance(self.client, Sender):
+            self.client.timeout_stop_sender()
+        else:
+            self.client.timeout_stop_receiver()
+
+
+class ClientSwarm(MessagingHandler, threading.Thread):
+    """
+    Multiplexes the links of many (not started) Sender and Receiver instances
+    across a set of connections, all handled by the same reactor thread.
+
+    Each client remains the handler for its own link events, so all counters
+    (sent, accepted, received, ...) and client specific behavior are kept. Clients
+    whose urls point to the same host and port share connections, holding at most
+    links_per_connection links each.
+    """
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, clients=None, links_per_connection=100, container_id=None):
+        super(ClientSwarm, self).__init__()
+        threading.Thread.__init__(self)
+        self.clients = list(clients or [])
+        self.links_per_connection = links_per_connection
+        self.container_id = container_id
+        self.container = None
+        self.connections = []
+        self._timeout_tasks = []
+        self._poll_task = None
+
+    def add(self, client):
+        """
+        Adds the given (not started) Sender or Receiver to the swarm.
+        Clients must be added before the swarm is started.
+        :param client:
+        :return: the given client
+        """
+        self.clients.append(client)
+        return client
+
+    def run(self):
+        """
+        Starts the thread and the Proton Container shared by all clients
+        :return:
+        """
+        self.container = Container(self)
+        if self.container_id:
+            self.container.container_id = self.container_id
+        self.container.run()
+
+        # If swarm gets disconnected from remote peers, stop all clients
+        logging.debug("Container.run() completed")
+        for client in self.clients:
+            self._stop_client(client)
+
+    def on_start(self, event):
+        """
+        Opens the connections and creates the links for all hosted clients
+        :param event:
+        :return:
+        """
+        # Open connections per host, holding at most links_per_connection links each
+        connections = {}
+        for index, client in enumerate(self.clients):
+            url = urlsplit(client.url)
+            base_url = '%s://%s' % (url.scheme or 'amqp', url.netloc)
+            address = url.path.lstrip('/')
+
+            host_connections = connections.setdefault(base_url, [])
+            if not host_connections or host_connections[-1][1] >= self.links_per_connection:
+                connection = event.container.connect(base_url)
+                self.connections.append(connection)
+                host_connections.append([connection, 0])
+            host_connections[-1][1] += 1
+
+            # Link names must be unique, unless a durable subscription must be preserved
+            name = None
+            if not isinstance(client, Sender):
+                name = client.container_id if client.durable and client.container_id else \
+                    '%s-%d' % (client.container_id or 'receiver', index)
+
+            client.shared_connection = True
+            client.container = event.container
+            client.create_link(event.container, host_connections[-1][0], address, name=name, handler=client)
+
+            if client.timeout_secs > 0:
+                self._timeout_tasks.append(event.container.schedule(client.timeout_secs, _ClientTimeout(client)))
+
+        logging.debug("Swarm started %d clients using %d connections" % (len(self.clients), len(self.connections)))
+        self._poll_task = event.container.schedule(self.POLL_INTERVAL, self)
+
+    def on_timer(self, event):
+        """
+        Closes all connections once all hosted clients have stopped
+        :param event:
+        :return:
+        """
+        if not self.stopped:
+            self._poll_task = event.container.schedule(self.POLL_INTERVAL, self)
+            return
+
+        for task in self._timeout_tasks:
+            task.cancel()
+        for connection in self.connections:
+            connection.close()
+
+    @staticmethod
+    def _stop_client(client):
+        """
+        Stops the given client (Sender or Receiver).
+        :param client:
+        :return:
+        """
+        if isinstance(client, Sender):
+            client.stop_sender()
+        else:
+            client.stop_receiver()
+
+    @property
+    def stopped(self):
+        """
+        Returns True if all hosted clients have stopped.
+        :return:
+        """
+        return all(client.stopped for client in self.clients)
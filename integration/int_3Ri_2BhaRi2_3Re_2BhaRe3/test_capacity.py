@@ -0,0 +1,131 @@
+import logging
+import time
+
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.capacity import ProbeResult, Slo, find_knee
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.receiver import Receiver
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.sender import Sender
+
+
+class TestCapacity:
+    """
+    Searches for the maximum sustainable throughput (knee) from each router to
+    Router.I1, for each address type. Only runs when --capacity-sweep is given.
+
+    Rate control is only available with the integration (Proton python) Sender,
+    so it is the single client implementation being measured.
+    """
+    CLIENT = 'python-proton'
+
+    # Each probe offers the load during this period (message count = rate * duration)
+    PROBE_DURATION_S = 10
+    PROBE_GRACE_S = 20
+
+    MESSAGE_SIZE = 128
+
+    # Offered rates (messages per second)
+    MIN_RATE = 100
+    MAX_RATE = 20000
+    RESOLUTION = 0.1
+    MAX_PROBES = 12
+
+    # SLO: no loss, no timeouts and p99 latency (intended send time -> accepted) below 1 second
+    SLO = Slo(max_loss=0.0, max_latency=1.0, percentile=99.0)
+
+    ADDRESSES = {
+        'queue': 'brokeri2.nondurable.queue',
+        'topic': 'brokeri2.nondurable.topic',
+        'multicast': 'multicast/capacity',
+    }
+
+    # Broker queues keep the messages not consumed by a probe (i.e. SLO breached), so they are
+    # drained before each probe: in rounds of DRAIN_IDLE_S till a round receives nothing
+    # (up to DRAIN_TIMEOUT_S)
+    DRAINED_ADDRESS_TYPES = ('queue',)
+    DRAIN_IDLE_S = 2
+    DRAIN_TIMEOUT_S = 120
+
+    @staticmethod
+    def _get_router_url(router, address):
+        return "amqp://%s:%s/%s" % (router.node.get_ip(), router.port, address)
+
+    def _drain(self, router, address):
+        """
+        Consumes the messages left on the given address, returning how many were drained.
+        """
+        drained = 0
+        deadline = time.monotonic() + self.DRAIN_TIMEOUT_S
+        while time.monotonic() < deadline:
+            receiver = Receiver(url=self._get_router_url(router, address),
+                                message_count=0,
+                                timeout=self.DRAIN_IDLE_S,
+                                container_id='capacity-drain-%s' % router.node.hostname)
+            receiver.start()
+            receiver.join()
+            drained += receiver.received
+            if not receiver.received:
+                break
+        return drained
+
+    def _probe(self, router_send, router_recv, address, rate, drain=False):
+        """
+        Offers the given rate from router_send to router_recv during PROBE_DURATION_S.
+        Only the messages from the sender of this probe (tracked by sequence number)
+        are counted as received.
+        """
+        count = max(int(rate * self.PROBE_DURATION_S), 1)
+        timeout = self.PROBE_DURATION_S + self.PROBE_GRACE_S
+
+        if drain:
+            drained = self._drain(router_recv, address)
+            if drained:
+                logging.info("Drained %d messages left on %s" % (drained, address))
+
+        receiver = Receiver(url=self._get_router_url(router_recv, address),
+                            message_count=count,
+                            timeout=timeout,
+                            container_id=router_recv.name,
+                            ignore_dups=True)
+        receiver.start()
+        if not receiver.wait_attached(timeout):
+            receiver.join()
+            return ProbeResult(rate, count, 0, None, True)
+
+        sender = Sender(url=self._get_router_url(router_send, address),
+                        message_count=count,
+                        sender_id='capacity-%s-%d' % (router_send.node.hostname, rate),
+                        timeout=timeout,
+                        message_size=self.MESSAGE_SIZE,
+                        rate=rate)
+        sender.start()
+
+        sender.join()
+        receiver.join()
+
+        tracker = receiver.sequences.get(sender.user_id)
+        received = tracker.received - tracker.duplicates if tracker else 0
+        return ProbeResult(rate, count, received, sender.latency, sender.timed_out or receiver.timed_out)
+
+    @pytest.mark.parametrize('address_type', sorted(ADDRESSES))
+    def test_find_max_throughput(self, router, router_i1, address_type, request, benchmark_metrics):
+        if not request.config.getoption('capacity_sweep'):
+            pytest.skip("Capacity sweep disabled (use --capacity-sweep)")
+
+        address = self.ADDRESSES[address_type]
+        drain = address_type in self.DRAINED_ADDRESS_TYPES
+        knee = find_knee(lambda rate: self._probe(router, router_i1, address, rate, drain), self.SLO,
+                         self.MIN_RATE, self.MAX_RATE, self.RESOLUTION, self.MAX_PROBES)
+
+        for step in knee.steps:
+            latency = step.result.latency.summary() if step.result.latency else None
+            logging.info("rate: %.1f, received: %d/%d, reason: %s, latency: %s"
+                         % (step.rate, step.result.received, step.result.sent, step.reason, latency))
+
+        logging.info("Knee [client: %s, address type: %s, path: %s -> %s]: %s msg/s"
+                     % (self.CLIENT, address_type, router.node.hostname, router_i1.node.hostname, knee.rate))
+
+        assert knee.rate is not None, "SLO breached at the minimum rate (%s msg/s)" % self.MIN_RATE
+
+        # Knee is only as precise as the search resolution
+        benchmark_metrics.record('knee_throughput', knee.rate, unit='msg/s', tolerance=self.RESOLUTION * 100)
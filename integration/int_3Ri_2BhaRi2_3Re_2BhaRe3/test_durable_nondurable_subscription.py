@@ -1,5 +1,4 @@
-import hashlib
-import time
+import logging
 
 from pytest_iqa.instance import IQAInstance
 
@@ -20,7 +19,6 @@ class TestDurableNonDurableSubscription(object):
     MESSAGES = 1000
     MESSAGE_SIZE = 128
     TIMEOUT = 600
-    DELAY = 5
 
     @staticmethod
     def _get_router_url(router, topic):
@@ -53,7 +51,8 @@ class TestDurableNonDurableSubscription(object):
                                sender_id='sender-%s' % router.node.hostname,
                                timeout=self.TIMEOUT,
                                message_size=self.MESSAGE_SIZE,
-                               use_unique_body=True)
+                               use_unique_body=True,
+                               checksum=True)
             publishers.append(publisher)
 
             # Starting publisher
@@ -90,7 +89,7 @@ class TestDurableNonDurableSubscription(object):
                                   timeout=timeout or self.TIMEOUT,
                                   container_id=container_id,
                                   durable=durable,
-                                  save_messages=True)
+                                  verify_integrity=True)
             subscribers.append(subscriber)
 
             # Starting subscriber
@@ -98,7 +97,7 @@ class TestDurableNonDurableSubscription(object):
 
         return subscribers
 
-    def validate_all_messages_received(self, sent_body, routers, subscribers):
+    def validate_all_messages_received(self, routers, subscribers):
         """
         Common validation for test cases where receivers are expected to
         receive a pre-defined amount of messages. The following validations
@@ -106,15 +105,17 @@ class TestDurableNonDurableSubscription(object):
         - Each receiver in the provided subscriber list, received self.MESSAGES * len(routers)
           (pre-defined amount of messages times number of routers in the topology)
         - Subscriber list cannot be empty
-        - Each subscriber in the list must have a list with all message bodies received
-        - If performs an SHA1 sum of each received body and compares it with the SHA1 for
-          the unique message body sent by all senders
-        :param sent_body:
+        - Each subscriber must have verified the integrity of all received messages on arrival
+          (CRC32 of each received body matches the checksum stamped by the sender)
         :param routers:
         :param subscribers:
         :return:
         """
 
+        # Loss, duplicates and reordering per sender (helps understanding count mismatches)
+        for s in subscribers:
+            logging.info("Sequence summary for %s: %s" % (s.container_id, s.sequence_summary()))
+
         # Validate all subscribers received expected amount of messages
         expected_count = self.MESSAGES * len(routers)
         receiver_results = [(s.container_id,
@@ -124,18 +125,15 @@ class TestDurableNonDurableSubscription(object):
             "Unable to receive %d messages through receivers: %s" % \
             (expected_count, ["%s=%d" % (res[0], res[1]) for res in receiver_results if not res[2]])
 
-        # Validating received message contents (integrity)
-        sha1_sum = hashlib.sha1(sent_body.encode('utf-8')).hexdigest()
-
         # Checking integrity on all received messages across all routers
         # Ensure there are subscribers
         assert subscribers
         for s in subscribers:
-            # Ensure there are messages to be validated
-            assert s.messages
-            for m in s.messages:
-                res_sha1_sum = hashlib.sha1(m.encode('utf-8')).hexdigest()
-                assert res_sha1_sum == sha1_sum, 'Received message content is not expected on %s' % s.container_id
+            # Ensure there are messages validated
+            assert s.integrity_passed > 0
+            assert s.integrity_failed == 0, \
+                'Received message content is not expected on %s: %s' % (s.container_id, s.integrity_failures)
+            assert s.integrity_passed == s.received
 
     def validate_all_messages_sent(self, publishers):
         """
@@ -159,7 +157,7 @@ class TestDurableNonDurableSubscription(object):
         Then it validates:
         - Number of messages sent
         - Number of messages received by each receiver (expecting self.MESSAGES * len(routers))
-        - Integrity of received messages by comparing received body SHA1 with unique SHA1 sum from sent body.
+        - Integrity of received messages (verified by receivers against the checksum stamped by senders).
         :param topic_durable: Fixture that provides the topic to send/receive from
         :param broker: A Broker component instance (not being used yet, but illustrates which broker is being used)
         :param iqa: IQAInstance fixture that provides a list with all routers that will be used
@@ -176,9 +174,9 @@ class TestDurableNonDurableSubscription(object):
         # Create subscriber list
         subscribers = self.create_subscribers(routers, topic_durable, durable=True)
 
-        # Wait till all receivers have been created
-        while not all(s.receiver for s in subscribers):
-            time.sleep(TestDurableNonDurableSubscription.DELAY)
+        # Wait till all receivers have been attached
+        for s in subscribers:
+            s.wait_attached(self.TIMEOUT)
 
         # Create publisher list
         publishers = self.create_publishers(routers, topic_durable)
@@ -192,7 +190,7 @@ class TestDurableNonDurableSubscription(object):
         self.validate_all_messages_sent(publishers)
 
         # Assert that all receivers received expected amount of messages
-        self.validate_all_messages_received(publishers[0].message_body, routers, subscribers)
+        self.validate_all_messages_received(routers, subscribers)
 
     def test_asynchronous_durable_subscription(self, topic_durable, broker, iqa: IQAInstance):
         """
@@ -206,7 +204,7 @@ class TestDurableNonDurableSubscription(object):
         Then it validates:
         - Number of messages sent
         - Number of messages received by each receiver (expecting self.MESSAGES * len(routers))
-        - Integrity of received messages by comparing received body SHA1 with unique SHA1 sum from sent body.
+        - Integrity of received messages (verified by receivers against the checksum stamped by senders).
         :param topic_durable: Fixture that provides the topic to send/receive from
         :param broker: A Broker component instance (not being used yet, but illustrates which broker is being used)
         :param iqa: IQAInstance fixture that provides a list with all routers that will be used
@@ -239,7 +237,7 @@ class TestDurableNonDurableSubscription(object):
         [s.join() for s in subscribers]
 
         # Assert that all receivers received expected amount of messages
-        self.validate_all_messages_received(publishers[0].message_body, routers, subscribers)
+        self.validate_all_messages_received(routers, subscribers)
 
     def test_synchronous_nondurable_subscription(self, topic_nondurable, broker, iqa: IQAInstance):
         """
@@ -250,7 +248,7 @@ class TestDurableNonDurableSubscription(object):
         Then it validates:
         - Number of messages sent
         - Number of messages received by each receiver (expecting self.MESSAGES * len(routers))
-        - Integrity of received messages by comparing received body SHA1 with unique SHA1 sum from sent body.
+        - Integrity of received messages (verified by receivers against the checksum stamped by senders).
         :param topic_nondurable: Fixture that provides the topic to send/receive from
         :param broker: A Broker component instance (not being used yet, but illustrates which broker is being used)
         :param iqa: IQAInstance fixture that provides a list with all routers that will be used
@@ -267,9 +265,9 @@ class TestDurableNonDurableSubscription(object):
         # Create subscriber list
         subscribers = self.create_subscribers(routers, topic_nondurable, durable=False)
 
-        # Wait till all receivers have been created
-        while not all(s.receiver for s in subscribers):
-            time.sleep(TestDurableNonDurableSubscription.DELAY)
+        # Wait till all receivers have been attached
+        for s in subscribers:
+            s.wait_attached(self.TIMEOUT)
 
         # Create publisher list
         publishers = self.create_publishers(routers, topic_nondurable)
@@ -283,7 +281,7 @@ class TestDurableNonDurableSubscription(object):
         self.validate_all_messages_sent(publishers)
 
         # Assert that all receivers received expected amount of messages
-        self.validate_all_messages_received(publishers[0].message_body, routers, subscribers)
+        self.validate_all_messages_received(routers, subscribers)
 
     def test_asynchronous_nondurable_subscription(self, topic_nondurable, broker, iqa: IQAInstance):
         """
@@ -313,9 +311,9 @@ class TestDurableNonDurableSubscription(object):
         # Create subscriber list
         subscribers = self.create_subscribers(routers, topic_nondurable, durable=False, timeout=async_timeout)
 
-        # Wait till all receivers have been created
-        while not all(s.receiver for s in subscribers):
-            time.sleep(TestDurableNonDurableSubscription.DELAY)
+        # Wait till all receivers have been attached
+        for s in subscribers:
+            s.wait_attached(self.TIMEOUT)
 
         # Now stop all receivers to ensure non-durable subscription was discarded
         [s.stop_receiver() for s in subscribers]
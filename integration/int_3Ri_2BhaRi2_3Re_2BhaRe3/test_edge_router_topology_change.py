@@ -1,92 +1,170 @@
 import logging
 
 from messaging_abstract.component import ServiceStatus
-from messaging_components.routers.dispatch.management import RouterQuery
+
+from integration.wait import wait_until
+from . import lifecycle
+from .convergence import ConvergenceProbe
+from .snapshot import TopologySnapshot
 
 
 class TestEdgeRouterNotChangingTopology:
     """
     Test that validates adding or removing an Edge router wont change the topology.
     """
+    # Convergence probe: polling interval (seconds) and probe messages per second
+    PROBE_INTERVAL = 0.1
+    PROBE_RATE = 10
+
+    # Maximum time (seconds) for an edge router to reattach and deliver messages after started
+    CONVERGENCE_TIMEOUT = 60
+
+    # Maximum time (seconds) to wait for all edge routers to be ready for a simultaneous restart
+    BARRIER_TIMEOUT = 30
 
     @classmethod
     def setup_class(cls):
         # Stores topology change date from each interior router
         cls.last_topology_change = {}
 
-    def test_nodes_in_topology(self, router):
+    @staticmethod
+    def _capture(iqa, router_query_pool):
+        """
+        Fetches router info and nodes from all routers (in parallel).
+        :param iqa:
+        :param router_query_pool:
+        :return: TopologySnapshot
+        """
+        snapshot = TopologySnapshot.capture(iqa.get_routers(), router_query_pool, ('router', 'node'))
+        logging.debug("Topology snapshot taken in %.3f seconds" % snapshot.elapsed)
+        assert not snapshot.errors, "Unable to query routers: %s" % snapshot.errors
+        return snapshot
+
+    @staticmethod
+    def _self_node(router_snapshot):
+        """
+        Returns the node that represents the router itself (None if not found).
+        :param router_snapshot:
+        :return:
+        """
+        for node in router_snapshot.entities['node']:
+            if node.nextHop == '(self)':
+                return node
+        return None
+
+    def test_nodes_in_topology(self, iqa, router_query_pool):
         """
         Validates that edge routers do not show any node when queried, and
         interior routers are showing other nodes.
         It also stores last topology change from each interior router and it
         will be used later, after edge routers are restarted.
-        :param router:
+        :param iqa:
+        :param router_query_pool:
         :return:
         """
-        query = RouterQuery(router.node.get_ip(), router.port, router)
+        snapshot = self._capture(iqa, router_query_pool)
 
-        # Get router mode
-        router_info = query.router()[0]
-        mode = router_info.mode
+        for name, router_snapshot in snapshot.routers.items():
+            # Get router mode
+            router_info = router_snapshot.entities['router'][0]
+            nodes = router_snapshot.entities['node']
 
-        # Query nodes in network
-        nodes = query.node()
-
-        # If edge, expect no nodes returned
-        if mode == 'edge':
-            assert not nodes
-            return
+            # If edge, expect no nodes returned
+            if router_info.mode == 'edge':
+                assert not nodes, "%s (edge) shows nodes" % name
+                continue
 
-        # Following applies just to interior
-        assert nodes
-        assert len(nodes) > 1
+            # Following applies just to interior
+            assert len(nodes) > 1, "%s (interior) does not show other nodes" % name
 
-        # Loop through nodes and store lastTopoChange for current instance
-        for node in nodes:
-            if node.nextHop == '(self)':
+            # Store lastTopoChange for current instance
+            node = self._self_node(router_snapshot)
+            if node is not None:
                 self.last_topology_change[router_info.name] = node.lastTopoChange
                 logging.debug("Last topology change for: %s = %s" % (router_info.name, node.lastTopoChange))
 
-    def test_restart_edge_routers(self, router_edge):
+    def test_restart_edge_routers(self, iqa, router_edge, router_i1, router_query_pool, benchmark_metrics):
         """
         Restart all edge routers and ensure they have stopped and started.
+        While each edge router is restarted, a ConvergenceProbe measures the time it takes
+        to reattach to the interior routers and to deliver probe messages again.
+        :param iqa:
         :param router_edge:
+        :param router_i1:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        router_edge.service.stop()
-        assert router_edge.service.status() == ServiceStatus.STOPPED
+        interiors = [r for r in iqa.get_routers() if r.node.hostname.startswith('Router.I')]
+        probe = ConvergenceProbe(router_edge, interiors, router_query_pool, router_i1,
+                                 'convergence/%s' % router_edge.node.hostname,
+                                 interval=self.PROBE_INTERVAL, rate=self.PROBE_RATE)
+        probe.start()
 
-        router_edge.service.start()
-        assert router_edge.service.status() == ServiceStatus.RUNNING
+        try:
+            router_edge.service.stop()
+            probe.mark_stopped()
+            assert router_edge.service.status() == ServiceStatus.STOPPED
 
-    def test_topology_not_changed(self, router_interior):
+            probe.mark_started()
+            router_edge.service.start()
+            assert router_edge.service.status() == ServiceStatus.RUNNING
+
+            wait_until(lambda: probe.reattached and probe.delivering, self.CONVERGENCE_TIMEOUT,
+                       description="%s convergence" % router_edge.node.hostname)
+        finally:
+            convergence = probe.finish()
+
+        logging.info("Convergence of %s: time to reattach: %s, time to first delivery: %s, "
+                     "topology changes: %s (%d polls)" % convergence)
+
+        benchmark_metrics.record('time_to_reattach', convergence.time_to_reattach, unit='s', higher_is_better=False)
+        benchmark_metrics.record('time_to_first_delivery', convergence.time_to_first_delivery, unit='s',
+                                 higher_is_better=False)
+
+        assert convergence.time_to_reattach is not None, "%s did not reattach" % convergence.edge
+        assert convergence.time_to_first_delivery is not None, "%s did not deliver messages" % convergence.edge
+
+    def test_restart_edge_routers_simultaneously(self, iqa, benchmark_metrics):
         """
-        Query all interior routers one more time and expect last topology change variable
-        to return the same value and that the number of nodes in the network remains the same.
-        :param router_interior:
+        Restart all edge routers at the same time (synchronized by a barrier) and
+        ensure they are all running again.
+        :param iqa:
+        :param benchmark_metrics:
         :return:
         """
+        edges = [r for r in iqa.get_routers() if r.node.hostname.startswith('Router.E')]
+        results = lifecycle.restart_all(edges, synchronized=True, timeout=self.BARRIER_TIMEOUT)
 
-        query = RouterQuery(router_interior.node.get_ip(),
-                            router_interior.port,
-                            router_interior)
+        for result in results:
+            logging.info("Restart of %s took %.3f seconds" % (result.component, result.elapsed))
 
-        # Retrieving router info
-        router_info = query.router()[0]
+        assert not lifecycle.failed(results), "Unable to restart edge routers: %s" % lifecycle.failed(results)
+        benchmark_metrics.record('slowest_restart', max(r.elapsed for r in results), unit='s', higher_is_better=False)
 
-        # Must be set to False after loop is processed
-        topology_changed = True
-        nodes = query.node()
+    def test_topology_not_changed(self, iqa, router_query_pool):
+        """
+        Query all interior routers one more time and expect last topology change variable
+        to return the same value and that the number of nodes in the network remains the same.
+        :param iqa:
+        :param router_query_pool:
+        :return:
+        """
+        snapshot = self._capture(iqa, router_query_pool)
 
-        for node in nodes:
-            if node.nextHop != '(self)':
+        for name, router_snapshot in snapshot.routers.items():
+            # Retrieving router info
+            router_info = router_snapshot.entities['router'][0]
+            if router_info.mode == 'edge':
                 continue
 
-            topology_changed = self.last_topology_change[router_info.name] != node.lastTopoChange
-            logging.debug("Last topology change for: %s = %s [before: %s]"
-                          % (router_info.name, self.last_topology_change[router_info.name], node.lastTopoChange))
+            nodes = router_snapshot.entities['node']
+            node = self._self_node(router_snapshot)
+            assert node is not None, "%s does not show itself as a node" % name
 
-            break
+            logging.debug("Last topology change for: %s = %s [before: %s]"
+                          % (router_info.name, node.lastTopoChange, self.last_topology_change[router_info.name]))
 
-        assert not topology_changed
-        assert len(nodes) == len(self.last_topology_change.keys())
+            assert self.last_topology_change[router_info.name] == node.lastTopoChange, \
+                "Topology changed on %s" % name
+            assert len(nodes) == len(self.last_topology_change.keys())
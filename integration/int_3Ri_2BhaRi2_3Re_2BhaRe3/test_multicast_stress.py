@@ -1,13 +1,16 @@
-import time, logging
+import os
+import time
+import logging
 from itertools import cycle
 
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.latency import merge_by_source, to_json
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.loadgen import LoadShardPool, Workload, shard_routers, \
+    merge_results_latency
 from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.receiver import Receiver
 from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.sender import Sender
-
-# for now it looks like the normal receiver is a hang receiver
-# it closes the connection on received expected message count (before settlement
-# and outome update)
-class HangReceiver(Receiver): pass
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.swarm import ClientSwarm
 
 class _Sender(Sender):
     def is_done_sending(self):
@@ -22,33 +25,68 @@ class TestMulticastStress:
 
     MESSAGE_SIZE = 128
 
+    # Interval used to sample client throughput (when --throughput-samples-dir is given)
+    SAMPLE_INTERVAL_S = 0.1
+
+    # Messages consumed by the slow receiver (at SLOW_CONSUME_RATE messages per second) and tolerance
+    # on its measured rate. Fast receivers must consume at least FAST_RATE_FACTOR times faster.
+    SLOW_CONSUME_RATE = 50
+    SLOW_MESSAGES_COUNT = 500
+    SLOW_RATE_TOLERANCE = 0.1
+    FAST_RATE_FACTOR = 2
+
     address = "multicast/bla"
 
     @staticmethod
     def _get_router_url(router, address):
         return "amqp://%s:%s/%s" % (router.node.get_ip(), router.port, address)
 
-    def _receiver(self, router, topic, save_messages, durable, r_class,
-                  message_count):
-        r = r_class(url=self._get_router_url(router, topic),
-                    message_count=message_count,
-                    timeout=self.RECV_TIMEOUT_S,
-                    save_messages=save_messages,
-                    durable=durable,
-                    container_id = router.name
-                    )
+    @staticmethod
+    def _export_samples(clients, directory):
+        """
+        Exports the throughput samples of the given clients as CSV and JSON files
+        into the given directory (one pair of files per client).
+        """
+        os.makedirs(directory, exist_ok=True)
+        for index, client in enumerate(clients):
+            if not client.sampler:
+                continue
+            name = getattr(client, 'sender_id', None) or client.container_id
+            path = os.path.join(directory, '%03d-%s' % (index, name))
+            client.sampler.to_csv(path + '.csv')
+            client.sampler.to_json(path + '.json')
+
+    def _receiver(self, router, topic, save_messages, durable,
+                  message_count, swarm=None, sample_interval=0, timeout=None, processing_delay=0):
+        r = Receiver(url=self._get_router_url(router, topic),
+                     message_count=message_count,
+                     timeout=timeout or self.RECV_TIMEOUT_S,
+                     save_messages=save_messages,
+                     durable=durable,
+                     container_id = router.name,
+                     sample_interval=sample_interval,
+                     processing_delay=processing_delay
+                     )
+        if swarm is not None:
+            return swarm.add(r)
         r.start()
         return r
 
-    def launch_receivers(self, recv_count_list, iqa, r_class=Receiver):
+    def launch_receivers(self, recv_count_list, iqa, swarm=None, sample_interval=0,
+                         timeout=None, processing_delay=0):
+        """
+        Launches one receiver per element of recv_count_list, cycling through all routers.
+        If a (not started) ClientSwarm is given, receivers are hosted by it and the swarm is
+        started, otherwise each receiver runs its own thread.
+        Receivers consume one message every processing_delay seconds, when given (slow consumers).
+        """
         #remember I3 router has an intentional eth 100ms delay
         all_routers = iqa.get_routers()
         cycle_routers = cycle(all_routers)
 
         def _wait(receivers):
             for r in receivers:
-                while not r.receiver:
-                    time.sleep(1)
+                r.wait_attached(self.RECV_TIMEOUT_S)
 
         receivers = []
         for  recv_count in recv_count_list:
@@ -56,15 +94,21 @@ class TestMulticastStress:
                                             topic=self.address,
                                             save_messages=True,
                                             durable=False,
-                                            r_class=r_class,
                                             message_count=recv_count,
+                                            swarm=swarm,
+                                            sample_interval=sample_interval,
+                                            timeout=timeout,
+                                            processing_delay=processing_delay,
                                            )
                             )
 
+        if swarm is not None:
+            swarm.start()
+
         _wait(receivers)
         return receivers
 
-    def _sender(self, router, topic):
+    def _sender(self, router, topic, sample_interval=0):
         s = _Sender(url=self._get_router_url(router, topic),
                    message_count=self.SEND_MESSAGES_COUNT,
                    sender_id='sender-%s' % router.node.hostname,
@@ -72,11 +116,89 @@ class TestMulticastStress:
                    message_size=self.MESSAGE_SIZE,
                    use_unique_body=True,
                    auto_settle=True,
+                   sample_interval=sample_interval,
                   )
         s.start()
         return s
 
-    def test_multiple_working_receivers(self, iqa, router_e1):
+    @staticmethod
+    def _router_memory(router_query_pool, router):
+        """
+        Returns the memory usage reported by the router management (None if not available)
+        """
+        return getattr(router_query_pool.query(router, 'router')[0], 'memoryUsage', None)
+
+    def test_one_slow_receiver(self, iqa, router_e1, router_query_pool, benchmark_metrics):
+        """
+        Measures multicast sender throughput and router memory growth when one of the
+        subscribers consumes slowly (SLOW_CONSUME_RATE messages per second).
+        Working receivers are expected to get all messages without being held back by the
+        slow receiver, whose throughput must be bounded by its consume rate.
+        """
+        slow_duration = self.SLOW_MESSAGES_COUNT / self.SLOW_CONSUME_RATE
+        fast_receivers = self.launch_receivers(23 * [self.SEND_MESSAGES_COUNT], iqa)
+        slow_receivers = self.launch_receivers([self.SLOW_MESSAGES_COUNT], iqa,
+                                               timeout=2 * slow_duration + self.RECV_TIMEOUT_S,
+                                               processing_delay=1.0 / self.SLOW_CONSUME_RATE)
+
+        # Time (since the sender started) each receiver completed
+        completed = {}
+        for r in fast_receivers + slow_receivers:
+            r.add_done_callback(lambda client: completed.setdefault(client, time.monotonic()))
+
+        memory_before = self._router_memory(router_query_pool, router_e1)
+        started = time.monotonic()
+        sender = self._sender(router_e1, self.address)
+        sender.join()
+        elapsed = time.monotonic() - started
+        memory_after = self._router_memory(router_query_pool, router_e1)
+
+        for r in fast_receivers + slow_receivers:
+            r.join()
+
+        def receiver_rate(r):
+            duration = completed[r] - started
+            return r.received / duration if duration > 0 else float('inf')
+
+        logging.info("""
+                     sender throughput: {:.2f} msg/s
+                     sender accepted: {}
+                     slow receiver received: {}
+                     router memory before: {}
+                     router memory after: {}
+                     """.format(sender.accepted / elapsed if elapsed else 0,
+                                sender.accepted,
+                                [r.received for r in slow_receivers],
+                                memory_before,
+                                memory_after))
+
+        assert not sender.timed_out
+        assert sender.rejected == 0
+        for r in fast_receivers:
+            assert not r.timed_out, "%s timed out" % r.container_id
+            assert r.received == r.total
+
+        # Slow receiver must not consume faster than its consume rate
+        slow_rate = self.SLOW_CONSUME_RATE * (1 + self.SLOW_RATE_TOLERANCE)
+        for r in slow_receivers:
+            assert not r.timed_out, "%s (slow) timed out" % r.container_id
+            assert r.received == r.total
+            assert receiver_rate(r) <= slow_rate, \
+                "%s (slow) consumed %.2f msg/s (expected at most %.2f)" % (r.container_id, receiver_rate(r), slow_rate)
+
+        # Fast receivers must not have been held back to the slow receiver pace
+        fast_rate = self.SLOW_CONSUME_RATE * self.FAST_RATE_FACTOR
+        held_back = ["%s=%.2f msg/s" % (r.container_id, receiver_rate(r)) for r in fast_receivers
+                     if receiver_rate(r) < fast_rate]
+        assert not held_back, "Receivers held back by the slow receiver: %s" % held_back
+
+        benchmark_metrics.record('sender_throughput', sender.accepted / elapsed if elapsed else None, unit='msg/s')
+        benchmark_metrics.record_latency('sender_latency', sender.latency)
+        benchmark_metrics.record('router_memory_growth', memory_after - memory_before
+                                 if memory_before is not None and memory_after is not None else None,
+                                 higher_is_better=False)
+
+    def test_multiple_working_receivers(self, iqa, router_e1, request, benchmark_metrics):
         def evaluate_sender(s):
             logging.info("""
                             total: {}
@@ -149,18 +271,93 @@ class TestMulticastStress:
                                        int(0.2 * self.SEND_MESSAGES_COUNT),
                                        int(0.15 * self.SEND_MESSAGES_COUNT)]
 
-        good_receivers = self.launch_receivers(good_recv_count_list, iqa)
-        broken_receivers = self.launch_receivers(broken_receivers_count_list, iqa, HangReceiver)
-        timeout_receivers = self.launch_receivers([self.SEND_MESSAGES_COUNT * 2], iqa)
+        # When requested, each group of receivers is hosted by a single reactor thread
+        swarms = [ClientSwarm() for _ in range(3)] if request.config.getoption('client_swarm') else []
+        receiver_swarms = swarms or [None] * 3
 
-        no_timeout_receivers = good_receivers + broken_receivers
+        # Throughput is sampled only when samples must be exported
+        samples_dir = request.config.getoption('throughput_samples_dir')
+        interval = self.SAMPLE_INTERVAL_S if samples_dir else 0
 
-        sender = self._sender(router_send, self.address)
+        good_receivers = self.launch_receivers(good_recv_count_list, iqa, swarm=receiver_swarms[0],
+                                               sample_interval=interval)
+        # for now it looks like the normal receiver is a hang receiver
+        # it closes the connection on received expected message count (before settlement
+        # and outome update)
+        broken_receivers = self.launch_receivers(broken_receivers_count_list, iqa,
+                                                 swarm=receiver_swarms[1], sample_interval=interval)
+        timeout_receivers = self.launch_receivers([self.SEND_MESSAGES_COUNT * 2], iqa, swarm=receiver_swarms[2],
+                                                  sample_interval=interval)
 
-        _wait_for_all_process_to_terminate(no_timeout_receivers + timeout_receivers + [sender])
+        no_timeout_receivers = good_receivers + broken_receivers
 
-        evaluate_result(no_timeout_receivers, timeout_receivers, sender)
+        started = time.monotonic()
+        sender = self._sender(router_send, self.address, sample_interval=interval)
+        sender.join()
+        elapsed = time.monotonic() - started
 
+        receiver_threads = swarms or no_timeout_receivers + timeout_receivers
+        _wait_for_all_process_to_terminate(receiver_threads)
 
+        # Exported before evaluating results, so samples are available when test fails
+        if samples_dir:
+            self._export_samples([sender] + no_timeout_receivers + timeout_receivers,
+                                 os.path.join(samples_dir, request.node.name))
 
+        evaluate_result(no_timeout_receivers, timeout_receivers, sender)
 
+        # End to end latency per path (sender router -> receiver router), merged across receivers
+        latency_per_path = merge_by_source([{'%s -> %s' % (source, r.container_id): histogram
+                                             for source, histogram in r.latency.items()}
+                                            for r in no_timeout_receivers + timeout_receivers])
+        logging.info("Latency per path: %s" % to_json(latency_per_path, indent=2))
+
+        benchmark_metrics.record('sender_throughput', sender.accepted / elapsed if elapsed else None, unit='msg/s')
+        benchmark_metrics.record_latency('sender_latency', sender.latency)
+
+    def test_sharded_multicast_load(self, iqa, request):
+        """
+        Generates multicast load from multiple worker processes (--load-processes), each one
+        pinned to its own slice of routers, running one receiver and one sender per router.
+        Expects every receiver to get the messages from all senders.
+        """
+        processes = request.config.getoption('load_processes')
+        if processes < 1:
+            pytest.skip("Sharded load disabled (use --load-processes)")
+
+        routers = iqa.get_routers()
+        router_slices = shard_routers(routers, processes)
+        expected = self.SEND_MESSAGES_COUNT * len(routers)
+
+        pool = LoadShardPool()
+
+        # Receivers must be attached before senders start (multicast)
+        pool.start_all([[Workload(Receiver, dict(url=self._get_router_url(router, self.address),
+                                                 message_count=expected,
+                                                 timeout=self.RECV_TIMEOUT_S,
+                                                 container_id=router.name))
+                         for router in router_slice]
+                        for router_slice in router_slices])
+
+        pool.start_all([[Workload(_Sender, dict(url=self._get_router_url(router, self.address),
+                                                message_count=self.SEND_MESSAGES_COUNT,
+                                                sender_id='sender-%s' % router.node.hostname,
+                                                timeout=self.SEND_TIMEOUT_S,
+                                                message_size=self.MESSAGE_SIZE,
+                                                use_unique_body=True))
+                         for router in router_slice]
+                        for router_slice in router_slices])
+
+        results = pool.join(timeout=max(self.RECV_TIMEOUT_S, self.SEND_TIMEOUT_S) * 2)
+        assert all(shard_results is not None for shard_results in results), "Some shards did not report results"
+
+        logging.info("Latency per source: %s" % to_json(merge_results_latency(results), indent=2))
+
+        for result in [result for shard_results in results for result in shard_results]:
+            logging.info("Shard client results: %s" % {k: v for k, v in result.items() if k != 'latency'})
+            assert not result['timed_out'], "%s timed out" % result['id']
+            if result['kind'] == 'sender':
+                assert result['accepted'] >= result['total']
+                assert result['rejected'] == 0
+            else:
+                assert result['received'] == expected
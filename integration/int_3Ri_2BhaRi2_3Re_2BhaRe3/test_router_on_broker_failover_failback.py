@@ -1,11 +1,9 @@
-import time
-
 from iqa_common.utils.tcp_util import TcpUtil
-from messaging_abstract.component import ServiceStatus
 from messaging_components.brokers import Artemis
 from messaging_components.routers import Dispatch
-from messaging_components.routers.dispatch.management import RouterQuery
 
+from integration.wait import wait_until
+from . import lifecycle
 from .receiver import Receiver
 from .sender import Sender
 
@@ -27,81 +25,66 @@ class TestRouterOnBrokerFailOverFailBack(object):
     MESSAGE_SIZE = 1024
     TIMEOUT = 30
 
-    @staticmethod
-    def _get_router_query(router: Dispatch) -> RouterQuery:
-        """
-        Creates a RouterQuery based on provided Router instance
-        :param router:
-        :return:
-        """
-        query = RouterQuery(host=router.node.get_ip(),
-                            port=router.port,
-                            router=router)
-        return query
+    # Deadlines (seconds) for the system to converge after deployment, fail-over or fail-back
+    CONNECTOR_TIMEOUT = 60
+    AUTOLINKS_TIMEOUT = 100
+    BROKER_ACTIVE_TIMEOUT = 100
+
+    # Convergence times depend on reconnect timers and polling backoff, so they are
+    # only considered a regression when far (percent) above the baseline
+    CONVERGENCE_TOLERANCE = 200.0
 
     @staticmethod
-    def validate_broker_connector_has_failoverurls(router):
+    def validate_broker_connector_has_failoverurls(router, router_query_pool):
         """
         Validate provided router instance has at least one route-container connector,
         and that the connector has the "failoverUrls" property set and it defines at least two urls.
+        Waits (up to CONNECTOR_TIMEOUT) till router has recovered from failover/failback.
         :param router:
-        :return:
+        :param router_query_pool:
+        :return: WaitResult
         """
         # Ensure that a router instance has been provided
         assert isinstance(router, Dispatch)
 
-        # Wait for 30 seconds to router recovered from failover/failback
-        time.sleep(30)
-
-        # Creates an instance of the RouterQuery class and retrieve autolinks and connectors
-        query = TestRouterOnBrokerFailOverFailBack._get_router_query(router)
+        # Pooled management client used to retrieve autolinks and connectors
+        query = router_query_pool.client(router)
 
-        # Changed to true if at least one connector has been found
-        connector_found = False
-
-        # Retrieving all connectors
-        for connector in query.connector():
+        def connectors_have_failoverurls():
             # ignore connectors to other routers
-            if connector.role != 'route-container':
-                continue
-
-            # One route-container connector found
-            connector_found = True
+            connectors = [c for c in query.connector() if c.role == 'route-container']
 
             # Connector must have failOverUrls defined and it must have more than 1 url
-            assert connector.failoverUrls
-            assert ',' in connector.failoverUrls
+            return connectors and all(c.failoverUrls and ',' in c.failoverUrls for c in connectors)
 
-        assert connector_found is True
+        result = wait_until(connectors_have_failoverurls, TestRouterOnBrokerFailOverFailBack.CONNECTOR_TIMEOUT,
+                            description="%s connector failoverUrls" % router.node.hostname)
+        assert result, "route-container connector without failoverUrls: %s" % result
+        return result
 
     @staticmethod
-    def validate_autolinks_active(router):
+    def validate_autolinks_active(router, router_query_pool):
         """
-        Validates that all autolinks are in active state for provided router instance.
+        Validates that all autolinks are in active state for provided router instance
+        (waiting up to AUTOLINKS_TIMEOUT).
         :param router:
-        :return:
+        :param router_query_pool:
+        :return: WaitResult
         """
         # Ensure that a router instance has been provided
         assert isinstance(router, Dispatch)
 
-        # Creates an instance of the RouterQuery class and retrieve autolinks and connectors
-        query = TestRouterOnBrokerFailOverFailBack._get_router_query(router)
+        # Pooled management client used to retrieve autolinks and connectors
+        query = router_query_pool.client(router)
 
         # Ensure all autolinks are in "active" status
-        max_attempts = 10
-        attempt = 0
-        all_autolinks_active = False
-
-        while not all_autolinks_active and attempt < max_attempts:
-            inactive = 0
-            for autolink in query.config_autolink():
-                if autolink.operStatus != 'active':
-                    inactive += 1
-            all_autolinks_active = inactive == 0
-            attempt += 1
-            time.sleep(10)
+        def all_autolinks_active():
+            return all(autolink.operStatus == 'active' for autolink in query.config_autolink())
 
-        assert all_autolinks_active
+        result = wait_until(all_autolinks_active, TestRouterOnBrokerFailOverFailBack.AUTOLINKS_TIMEOUT,
+                            description="%s autolinks active" % router.node.hostname)
+        assert result, "autolinks not active: %s" % result
+        return result
 
     def send_and_receive(self, queue, router):
         """
@@ -122,8 +105,7 @@ class TestRouterOnBrokerFailOverFailBack(object):
         sender.start()
 
         # Wait for sender to complete or timeout
-        while not sender.stopped:
-            pass
+        sender.wait_done()
 
         # Validate all messages were sent
         assert sender.sent == self.MESSAGE_COUNT
@@ -133,27 +115,21 @@ class TestRouterOnBrokerFailOverFailBack(object):
         receiver.start()
 
         # Waiting till all messages received or timed out
-        while not receiver.stopped:
-            pass
+        receiver.wait_done()
 
         # Validate all messages have been received
         assert receiver.received == self.MESSAGE_COUNT
 
     def broker_has_queues(self, broker):
         """
-        Assert that the provided broker instance has queues.
-        It attempts to retrieve queues "max_attempts" times with a delay of 1 between attempts.
+        Assert that the provided broker instance has queues, waiting up to BROKER_ACTIVE_TIMEOUT.
         :param broker:
-        :return:
+        :return: WaitResult
         """
-        max_attempts = 10
-        attempt = 0
-
-        while not broker.queues() and attempt < max_attempts:
-            time.sleep(10)
-            attempt += 1
-
-        assert len(broker.queues()) > 0
+        result = wait_until(broker.queues, self.BROKER_ACTIVE_TIMEOUT,
+                            description="%s queues" % broker.node.hostname)
+        assert result, "broker has no queues: %s" % result
+        return result
 
     def test_initial_state(self, broker_m_internal: Artemis, broker_s_internal: Artemis,
                            broker_m_edge: Artemis, broker_s_edge: Artemis, router_i2: Dispatch, router_e3: Dispatch):
@@ -179,21 +155,29 @@ class TestRouterOnBrokerFailOverFailBack(object):
         assert len(broker_s_internal.queues()) == 0
         assert len(broker_s_edge.queues()) == 0
 
-    def test_validate_broker_connector_initial_state(self, router_with_broker):
+    def test_validate_broker_connector_initial_state(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate initial state of router connector to broker
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_broker_connector_has_failoverurls(router_with_broker)
+        result = self.validate_broker_connector_has_failoverurls(router_with_broker, router_query_pool)
+        benchmark_metrics.record('connector_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
-    def test_validate_autolinks_initial_state(self, router_with_broker):
+    def test_validate_autolinks_initial_state(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate initial state of autolinks to broker
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_autolinks_active(router_with_broker)
+        result = self.validate_autolinks_active(router_with_broker, router_query_pool)
+        benchmark_metrics.record('autolinks_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
     def test_exchange_messages_initial_state(self, router, queue):
         """
@@ -204,38 +188,50 @@ class TestRouterOnBrokerFailOverFailBack(object):
         """
         self.send_and_receive(queue, router)
 
-    def test_broker_failover(self, broker_master: Artemis):
+    def test_broker_failover(self, broker_m_internal: Artemis, broker_m_edge: Artemis):
         """
-        Stops the provided master broker instance and ensure it has been stopped.
-        :param broker_master:
+        Stops all master broker instances (concurrently) and ensure they have been stopped.
+        :param broker_m_internal:
+        :param broker_m_edge:
         :return:
         """
-        broker_master.service.stop()
-        assert broker_master.service.status() == ServiceStatus.STOPPED
+        results = lifecycle.stop_all([broker_m_internal, broker_m_edge])
+        assert not lifecycle.failed(results), "Unable to stop brokers: %s" % lifecycle.failed(results)
 
-    def test_broker_slave_active(self, broker_slave: Artemis):
+    def test_broker_slave_active(self, broker_slave: Artemis, benchmark_metrics):
         """
         Wait till slave broker shows queues replicated from master broker (active).
         :param broker_slave:
+        :param benchmark_metrics:
         :return:
         """
-        self.broker_has_queues(broker_slave)
+        result = self.broker_has_queues(broker_slave)
+        benchmark_metrics.record('broker_active_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
-    def test_validate_broker_connector_after_failover(self, router_with_broker):
+    def test_validate_broker_connector_after_failover(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate state of router connector to broker after fail-over
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_broker_connector_has_failoverurls(router_with_broker)
+        result = self.validate_broker_connector_has_failoverurls(router_with_broker, router_query_pool)
+        benchmark_metrics.record('connector_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
-    def test_validate_autolinks_after_failover(self, router_with_broker):
+    def test_validate_autolinks_after_failover(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate state of autolinks to broker after fail-over
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_autolinks_active(router_with_broker)
+        result = self.validate_autolinks_active(router_with_broker, router_query_pool)
+        benchmark_metrics.record('autolinks_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
     def test_exchange_messages_after_failover(self, router, queue):
         """
@@ -246,38 +242,50 @@ class TestRouterOnBrokerFailOverFailBack(object):
         """
         self.send_and_receive(queue, router)
 
-    def test_broker_failback(self, broker_master: Artemis):
+    def test_broker_failback(self, broker_m_internal: Artemis, broker_m_edge: Artemis):
         """
-        Starts the provided master broker instance and ensure it has been started.
-        :param broker_master:
+        Starts all master broker instances (concurrently) and ensure they have been started.
+        :param broker_m_internal:
+        :param broker_m_edge:
         :return:
         """
-        broker_master.service.start()
-        assert broker_master.service.status() == ServiceStatus.RUNNING
+        results = lifecycle.start_all([broker_m_internal, broker_m_edge])
+        assert not lifecycle.failed(results), "Unable to start brokers: %s" % lifecycle.failed(results)
 
-    def test_broker_master_active(self, broker_master: Artemis):
+    def test_broker_master_active(self, broker_master: Artemis, benchmark_metrics):
         """
         Wait till master broker shows queues again (active).
         :param broker_master:
+        :param benchmark_metrics:
         :return:
         """
-        self.broker_has_queues(broker_master)
+        result = self.broker_has_queues(broker_master)
+        benchmark_metrics.record('broker_active_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
-    def test_validate_broker_connector_after_failback(self, router_with_broker):
+    def test_validate_broker_connector_after_failback(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate state of router connector to broker after fail-back
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_broker_connector_has_failoverurls(router_with_broker)
+        result = self.validate_broker_connector_has_failoverurls(router_with_broker, router_query_pool)
+        benchmark_metrics.record('connector_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
-    def test_validate_autolinks_after_failback(self, router_with_broker):
+    def test_validate_autolinks_after_failback(self, router_with_broker, router_query_pool, benchmark_metrics):
         """
         Validate state of autolinks to broker after fail-back
         :param router_with_broker:
+        :param router_query_pool:
+        :param benchmark_metrics:
         :return:
         """
-        self.validate_autolinks_active(router_with_broker)
+        result = self.validate_autolinks_active(router_with_broker, router_query_pool)
+        benchmark_metrics.record('autolinks_ready_time', result.elapsed, unit='s', higher_is_better=False,
+                                 tolerance=self.CONVERGENCE_TOLERANCE)
 
     def test_exchange_messages_after_failback(self, router, queue):
         """
@@ -0,0 +1,182 @@
+import logging
+import time
+
+import pytest
+from messaging_abstract.component import ServiceStatus
+from messaging_components.brokers import Artemis
+from messaging_components.routers import Dispatch
+
+from integration.wait import wait_until
+from .conftest import BROKER_QUEUES
+from .continuous import ContinuousReceiver, ContinuousSender
+
+
+class TestRouterOnBrokerFailoverOutage(object):
+    """
+    Keeps producers and consumers running on all broker queues (through Router.I1)
+    while the master broker is stopped (fail-over) and started again (fail-back),
+    measuring how long messaging was actually down for each queue.
+    Only runs when --failover-outage is given.
+
+    For each queue and phase it reports:
+    - Outage window: last message received before the disruption and first one
+      received after it (millisecond resolution)
+    - Throughput dip: received rate before the disruption vs. lowest rate (1s buckets) after it
+    - Lost and duplicated messages (based on the sequence numbers stamped by the sender),
+      apart from the deliveries refused (released, modified or rejected) by the router.
+      Messages whose sender link got detached before an outcome was received are not
+      re-sent, so they are reported as lost as well.
+    """
+    # Messages per second sent to each queue
+    RATE = 50
+    MESSAGE_SIZE = 1024
+
+    # Traffic observed before the first disruption and after each broker becomes active
+    WARMUP_S = 5
+    RECOVERY_S = 30
+
+    # Time given for in-flight messages to be received once senders are stopped
+    DRAIN_S = 5
+
+    # Maximum time for a broker to become active (show queues)
+    BROKER_ACTIVE_TIMEOUT = 100
+
+    # Clients are stopped explicitly, timeout is just to make sure test completes
+    TIMEOUT = 600
+
+    @staticmethod
+    def _get_url(router, queue):
+        return "amqp://%s:%s/%s" % (router.node.get_ip(), router.port, queue)
+
+    def _wait_broker_active(self, broker):
+        """
+        Waits till the provided broker instance has queues (active).
+        :param broker:
+        :return: WaitResult
+        """
+        result = wait_until(broker.queues, self.BROKER_ACTIVE_TIMEOUT, description="%s queues" % broker.node.hostname)
+        assert result, "%s did not become active" % broker.node.hostname
+        return result
+
+    def _start_traffic(self, router):
+        """
+        Starts one receiver and one sender per broker queue (receivers are attached first).
+        :param router:
+        :return: dictionary of queue -> (sender, receiver)
+        """
+        receivers = {}
+        for queue in BROKER_QUEUES:
+            receiver = ContinuousReceiver(self._get_url(router, queue), timeout=self.TIMEOUT,
+                                          container_id='outage-receiver-%s' % queue)
+            receiver.start()
+            receivers[queue] = receiver
+
+        for queue, receiver in receivers.items():
+            assert receiver.wait_attached(self.TIMEOUT), "Receiver not attached to %s" % queue
+
+        traffic = {}
+        for queue, receiver in receivers.items():
+            sender = ContinuousSender(self._get_url(router, queue), sender_id='outage-sender-%s' % queue,
+                                      rate=self.RATE, message_size=self.MESSAGE_SIZE, timeout=self.TIMEOUT)
+            sender.start()
+            traffic[queue] = (sender, receiver)
+        return traffic
+
+    def _stop_traffic(self, traffic):
+        """
+        Stops all senders and, after DRAIN_S, all receivers.
+        :param traffic:
+        :return:
+        """
+        for sender, _ in traffic.values():
+            sender.stop()
+            sender.join()
+
+        time.sleep(self.DRAIN_S)
+
+        for _, receiver in traffic.values():
+            receiver.stop()
+            receiver.join()
+
+    @staticmethod
+    def _phase_report(receiver, start, end, counters_before, counters_after):
+        """
+        Returns the outage, throughput dip, lost, duplicated and refused messages of a receiver
+        for the phase that begins with a disruption at start and lasts till end.
+        """
+        outage = receiver.timeline.outage(start, end)
+        dip = receiver.timeline.throughput_dip(start, end)
+        return {'outage': outage._asdict(),
+                'throughput': dip._asdict(),
+                'lost': counters_after['lost'] - counters_before['lost'],
+                'duplicates': counters_after['duplicates'] - counters_before['duplicates'],
+                'refused': counters_after['refused'] - counters_before['refused']}
+
+    def test_outage_on_failover_failback(self, broker_master: Artemis, broker_slave: Artemis, router_i1: Dispatch,
+                                         request, benchmark_metrics):
+        """
+        Stops and starts the master broker under continuous traffic, reporting the outage
+        per queue and phase. Traffic must recover on all queues after each phase.
+        :param broker_master:
+        :param broker_slave: slave broker of the same pair
+        :param router_i1:
+        :param request:
+        :param benchmark_metrics:
+        :return:
+        """
+        if not request.config.getoption('failover_outage'):
+            pytest.skip("Fail-over outage measurement disabled (use --failover-outage)")
+
+        no_loss = {'lost': 0, 'duplicates': 0, 'refused': 0}
+
+        traffic = self._start_traffic(router_i1)
+        try:
+            time.sleep(self.WARMUP_S)
+
+            # Fail-over
+            failover_at = time.time()
+            broker_master.service.stop()
+            assert broker_master.service.status() == ServiceStatus.STOPPED
+            self._wait_broker_active(broker_slave)
+            time.sleep(self.RECOVERY_S)
+
+            # Counters at the end of the fail-over phase
+            failover_counters = {queue: receiver.sequence_counters(sender)
+                                 for queue, (sender, receiver) in traffic.items()}
+
+            # Fail-back
+            failback_at = time.time()
+            broker_master.service.start()
+            assert broker_master.service.status() == ServiceStatus.RUNNING
+            self._wait_broker_active(broker_master)
+            time.sleep(self.RECOVERY_S)
+            finished_at = time.time()
+        finally:
+            self._stop_traffic(traffic)
+
+        not_recovered = []
+        for queue, (sender, receiver) in sorted(traffic.items()):
+            final_counters = receiver.sequence_counters(sender)
+            report = {'failover': self._phase_report(receiver, failover_at, failback_at,
+                                                     no_loss, failover_counters[queue]),
+                      'failback': self._phase_report(receiver, failback_at, finished_at,
+                                                     failover_counters[queue], final_counters)}
+
+            logging.info("""
+                         queue: %s
+                         sent: %d, accepted: %d, received: %d
+                         sender detached: %d, receiver detached: %d
+                         failover: %s
+                         failback: %s
+                         """ % (queue, sender.sent, sender.accepted, receiver.received,
+                                sender.detached, receiver.detached, report['failover'], report['failback']))
+
+            for phase in ('failover', 'failback'):
+                if report[phase]['outage']['first_after'] is None:
+                    not_recovered.append('%s (%s)' % (queue, phase))
+                benchmark_metrics.record('%s_%s_outage' % (queue, phase), report[phase]['outage']['duration_ms'],
+                                         unit='ms', higher_is_better=False)
+                benchmark_metrics.record('%s_%s_lost' % (queue, phase), report[phase]['lost'],
+                                         unit='msg', higher_is_better=False)
+
+        assert not not_recovered, "Traffic did not recover: %s" % ", ".join(not_recovered)
@@ -0,0 +1,73 @@
+"""
+Polling utility used to wait for a condition to be met (i.e. system to
+converge) without sleeping for fixed periods of time.
+"""
+import logging
+import time
+
+
+class WaitResult(object):
+    """
+    Result of wait_until(). Evaluates to True if condition has been met.
+    """
+    def __init__(self, ready, value, elapsed, attempts, error=None):
+        """
+        :param ready: whether condition has been met before the deadline
+        :param value: last value returned by the condition (None if it raised an exception)
+        :param elapsed: seconds elapsed till condition was met (or till the deadline)
+        :param attempts: number of times condition has been evaluated
+        :param error: last exception raised by the condition (if any)
+        """
+        self.ready = ready
+        self.value = value
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.error = error
+
+    def __bool__(self):
+        return self.ready
+
+    def __repr__(self):
+        return "WaitResult(ready=%s, elapsed=%.3f, attempts=%d, error=%r)" % \
+               (self.ready, self.elapsed, self.attempts, self.error)
+
+
+def wait_until(condition, timeout, delay=0.25, max_delay=10.0, backoff=2.0, description=None):
+    """
+    Evaluates condition till it returns a truthy value or the timeout expires,
+    waiting between attempts with an exponential backoff (delay, delay * backoff, ...
+    up to max_delay). Exceptions raised by condition are considered as "not ready".
+    The last attempt is done at the deadline.
+    :param condition: callable with no arguments
+    :param timeout: overall deadline in seconds
+    :param delay: initial delay between attempts in seconds
+    :param max_delay: maximum delay between attempts in seconds
+    :param backoff: factor applied to the delay after each attempt
+    :param description: used for logging
+    :return: WaitResult
+    """
+    description = description or getattr(condition, '__name__', 'condition')
+    started = time.monotonic()
+    deadline = started + timeout
+    attempts = 0
+
+    while True:
+        attempts += 1
+        value, error = None, None
+        try:
+            value = condition()
+        except Exception as ex:
+            error = ex
+            logging.debug("%s not ready (attempt %d): %s" % (description, attempts, ex))
+
+        now = time.monotonic()
+        if error is None and value:
+            logging.info("%s ready after %.3f seconds (%d attempts)" % (description, now - started, attempts))
+            return WaitResult(True, value, now - started, attempts)
+
+        if now >= deadline:
+            logging.warning("%s not ready after %.3f seconds (%d attempts)" % (description, now - started, attempts))
+            return WaitResult(False, value, now - started, attempts, error)
+
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)
@@ -16,6 +16,7 @@ import logging
 # TODO Java sender is working very slowly (need to discuss with clients team)
 ATTEMPTS = 20
 WAIT_ROUTER_MESH_SECS = 60
+MESH_POLL_SECS = 2
 MESH_SIZE = 3
 MESSAGE_COUNT = {'java': 10, 'python': 100, 'nodejs': 100}
 TIMEOUT = 120
@@ -152,30 +153,37 @@ def test_router_mesh_after_scale_down(router: Dispatch):
 def validate_mesh_size(router, new_size):
     """
     Asserts that router topology size matches "new_size" value.
+    Router is polled every MESH_POLL_SECS till the mesh is formed or
+    ATTEMPTS * WAIT_ROUTER_MESH_SECS seconds have elapsed.
     :param router:
     :param new_size:
     :return:
     """
-    for attempt in range(ATTEMPTS):
-        # Wait before querying nodes
-        logger.debug('Attempt %d/%d' % (attempt+1, ATTEMPTS))
-        logger.debug('Waiting %s seconds for router mesh to be formed' % WAIT_ROUTER_MESH_SECS)
-        time.sleep(WAIT_ROUTER_MESH_SECS)
-    
-        # Query nodes in topology
+    started = time.monotonic()
+    deadline = started + ATTEMPTS * WAIT_ROUTER_MESH_SECS
+    query = None
+    node_list = []
+
+    while time.monotonic() < deadline:
+        # Query nodes in topology (reusing the management connection)
         try:
-            query = RouterQuery(host=router.node.ip, port=router.port, router=router)
+            query = query or RouterQuery(host=router.node.ip, port=router.port, router=router)
             node_list = query.node()
         except ConnectionException as ex:
             logging.error("Unable to connect with router: %s" % ex)
+            query = None
+            time.sleep(MESH_POLL_SECS)
             continue
 
         logging.debug("List of nodes: %s" % node_list)
 
         # If expected number of nodes found, break
         if len(node_list) == new_size:
+            logger.info('Router mesh formed after %.3f seconds' % (time.monotonic() - started))
             break
 
+        time.sleep(MESH_POLL_SECS)
+
     # Assertions
     assert node_list
     assert len(node_list) == new_size
@@ -0,0 +1,83 @@
+"""
+Concurrent execution of operations (i.e. scaling through OpenShiftUtil or
+mesh validation) on all OpenShift clusters given through --cluster/--token,
+keeping the outcome of each cluster.
+"""
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from iqa_common.utils.openshift_util import OpenShiftUtil
+
+# Outcome of an operation on a single cluster: value returned by the operation,
+# error raised (None if succeeded) and its duration in seconds
+ClusterResult = namedtuple('ClusterResult', ['cluster', 'value', 'error', 'elapsed'])
+
+logger = logging.getLogger(__name__)
+
+
+def openshift_util(router_cluster) -> OpenShiftUtil:
+    """
+    Returns an OpenShiftUtil instance for the given (router, cluster, token).
+    :param router_cluster:
+    :return:
+    """
+    router, cluster, token = router_cluster
+    return OpenShiftUtil(router.executor, 'https://%s:8443' % cluster, token)
+
+
+def run_on_clusters(router_clusters, operation, max_workers=None):
+    """
+    Runs operation(router_cluster) for all clusters concurrently (one thread per cluster).
+    :param router_clusters: list of (router, cluster, token)
+    :param operation: callable receiving a (router, cluster, token) tuple
+    :param max_workers: maximum number of clusters handled at the same time (defaults to all)
+    :return: list of ClusterResult (same order as router_clusters)
+    """
+    router_clusters = list(router_clusters)
+    if not router_clusters:
+        return []
+
+    def run(router_cluster):
+        cluster = router_cluster[1]
+        begin = time.monotonic()
+        value, error = None, None
+        try:
+            value = operation(router_cluster)
+        except Exception as ex:
+            logger.error("Operation failed on cluster %s: %s" % (cluster, ex))
+            error = ex
+        elapsed = time.monotonic() - begin
+        logger.debug("Operation on cluster %s took %.3f seconds" % (cluster, elapsed))
+        return ClusterResult(cluster, value, error, elapsed)
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(router_clusters)) as executor:
+        return list(executor.map(run, router_clusters))
+
+
+def scale_all(router_clusters, replicas, deployment_config='amq-interconnect'):
+    """
+    Scales the deployment config on all clusters concurrently.
+    An operation fails if the scale command does not complete successfully.
+    :param router_clusters:
+    :param replicas: number of replicas, or dictionary of cluster -> number of replicas
+    :param deployment_config:
+    :return: list of ClusterResult (value is the Execution of the scale command)
+    """
+    def scale(router_cluster):
+        cluster_replicas = replicas[router_cluster[1]] if isinstance(replicas, dict) else replicas
+        execution = openshift_util(router_cluster).scale(cluster_replicas, deployment_config)
+        assert execution.completed_successfully(), "Unable to scale to %d replicas" % cluster_replicas
+        return execution
+
+    return run_on_clusters(router_clusters, scale)
+
+
+def failed(results):
+    """
+    Returns a dictionary of cluster -> error message, for clusters where the operation failed.
+    :param results: list of ClusterResult
+    :return:
+    """
+    return {r.cluster: str(r.error) for r in results if r.error is not None}
@@ -1,6 +1,6 @@
 import pytest
 import itertools
-from typing import Union, Tuple
+from typing import List, Union, Tuple
 
 from messaging_components.clients import \
     ReceiverJava, SenderJava, \
@@ -35,6 +35,15 @@ def pytest_addoption(parser):
     parser.addoption("--msg-length", action="append", required=False, default=[256],
                      help="Message length")
 
+    parser.addoption("--namespace", action="store", required=False, default=None,
+                     help="Namespace (project) where routers are deployed (defaults to the current oc project)")
+
+    parser.addoption("--scaling-series", action="store", required=False, default=None,
+                     help="Comma separated replica counts (i.e. 1,2,4,8) for the mesh scaling benchmark")
+
+    parser.addoption("--scaling-results", action="store", required=False, default=None,
+                     help="Directory where the scaling curve of each cluster is written (JSON)")
+
 
 def pytest_generate_tests(metafunc):
     """
@@ -47,7 +56,6 @@ def pytest_generate_tests(metafunc):
     clients_cluster = [client + '_' + str(cluster) for client, cluster
                        in itertools.product(clients, range(0, clusters_count))]
 
-    routers = ['router' + '_' + str(cluster) for cluster in range(0, clusters_count)]
     senders = ['sender' + '_' + client for client in clients_cluster]
     receivers = ['receiver' + '_' + client for client in clients_cluster]
 
@@ -62,9 +70,6 @@ def pytest_generate_tests(metafunc):
     if 'receiver' in metafunc.fixturenames:
         metafunc.parametrize('receiver', receivers, indirect=True)
 
-    if 'router_cluster' in metafunc.fixturenames:
-        metafunc.parametrize('router_cluster', routers, indirect=True)
-
 
 @pytest.fixture()
 def receiver(request, iqa) -> Union[ReceiverJava, ReceiverPython, ReceiverNodeJS]:
@@ -101,15 +106,12 @@ def sender(request, iqa) -> Union[SenderJava, SenderPython, SenderNodeJS]:
 
 
 @pytest.fixture()
-def router_cluster(request, iqa) -> Tuple[Dispatch, str, str]:
+def router_clusters(request, iqa) -> List[Tuple[Dispatch, str, str]]:
     """
-    Returns the router, cluster and token from parameter
+    Returns the router, cluster and token of all clusters (in the same order
+    as --cluster), so that tests can operate on them concurrently.
     :param request:
     :param iqa:
-    :return: Returns router instance based on parametrized info
+    :return:
     """
-    if 'router_' in request.param:
-        router_number = int(request.param.split('_')[1])
-        return (iqa.get_routers()[router_number],
-                request.config.option.cluster[router_number],
-                request.config.option.token[router_number])
+    return list(zip(iqa.get_routers(), request.config.option.cluster, request.config.option.token))
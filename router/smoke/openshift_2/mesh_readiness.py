@@ -0,0 +1,334 @@
+"""
+Readiness of the router mesh deployed on OpenShift, driven by a watch on the
+router pods (kubernetes client) combined with fast polling of the number of
+nodes reported by the router management.
+
+The pod watch only needs the API server url and a token, so it can also be
+exercised against a local fake API server (i.e. api_client('http://127.0.0.1:8080', 'token')),
+see selftests/test_mesh_readiness.py.
+
+Pods are watched in the namespace (project) routers are deployed to, as tokens of
+regular project users are not allowed to watch pods across all namespaces.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from iqa_common.executor import Command
+from kubernetes import client, watch
+from messaging_components.routers.dispatch.management import RouterQuery
+
+# Deployment config name used by the official templates
+DEPLOYMENT_CONFIG = 'amq-interconnect'
+LABEL_SELECTOR = 'deploymentconfig=%s' % DEPLOYMENT_CONFIG
+
+# Result of wait_for_mesh(): times (seconds) are measured from the beginning of the wait
+# (None if not reached before the deadline). polls and failed_polls count the management
+# queries issued during the whole wait and the ones that failed (router unavailable).
+MeshReadiness = namedtuple('MeshReadiness', ['ready', 'pods_ready_time', 'mesh_formed_time',
+                                             'ready_pods', 'node_count', 'polls', 'failed_polls'])
+
+logger = logging.getLogger(__name__)
+
+
+def api_client(host, token, verify_ssl=False) -> client.CoreV1Api:
+    """
+    Returns a kubernetes CoreV1Api client for the given API server.
+    :param host: API server url (i.e. https://<cluster>:8443)
+    :param token: bearer token
+    :param verify_ssl:
+    :return:
+    """
+    configuration = client.Configuration()
+    configuration.host = host
+    configuration.verify_ssl = verify_ssl
+    configuration.api_key = {'authorization': 'Bearer %s' % token}
+    return client.CoreV1Api(client.ApiClient(configuration))
+
+
+def current_namespace(router, server, token, timeout=60) -> str:
+    """
+    Returns the project used by the oc session (where OpenShiftUtil scales the router
+    deployment config), that is the namespace routers are deployed to.
+    :param router: router whose executor runs the oc command
+    :param server: API server url (i.e. https://<cluster>:8443)
+    :param token: bearer token
+    :param timeout:
+    :return:
+    """
+    execution = router.execute(Command(args=['oc', 'project', '-q', '--server=%s' % server, '--token=%s' % token],
+                                       timeout=timeout, stdout=True, stderr=True))
+    execution.wait()
+    namespace = execution.read_stdout().strip() if execution.completed_successfully() else None
+    if not namespace:
+        raise RuntimeError("Unable to determine the router namespace on %s" % server)
+    return namespace
+
+
+def current_replicas(router, server, token, namespace, deployment_config=DEPLOYMENT_CONFIG, timeout=60) -> int:
+    """
+    Returns the number of replicas the router deployment config is currently scaled to.
+    :param router: router whose executor runs the oc command
+    :param server: API server url (i.e. https://<cluster>:8443)
+    :param token: bearer token
+    :param namespace: namespace of the deployment config (see current_namespace())
+    :param deployment_config:
+    :param timeout:
+    :return:
+    """
+    execution = router.execute(Command(args=['oc', 'get', 'dc/%s' % deployment_config,
+                                             '-o', 'jsonpath={.spec.replicas}', '--namespace=%s' % namespace,
+                                             '--server=%s' % server, '--token=%s' % token],
+                                       timeout=timeout, stdout=True, stderr=True))
+    execution.wait()
+    replicas = execution.read_stdout().strip() if execution.completed_successfully() else ''
+    if not replicas.isdigit():
+        raise RuntimeError("Unable to determine the replicas of %s on %s" % (deployment_config, server))
+    return int(replicas)
+
+
+def is_pod_ready(pod) -> bool:
+    """
+    Returns True if the pod is running, not being deleted and its Ready condition is true.
+    :param pod:
+    :return:
+    """
+    if pod.metadata.deletion_timestamp is not None or pod.status.phase != 'Running':
+        return False
+    return any(c.type == 'Ready' and c.status == 'True' for c in pod.status.conditions or [])
+
+
+class PodWatcher(threading.Thread):
+    """
+    Watches the pods matching the label selector (the initial events list the
+    existing pods), keeping the names of the ready ones.
+    """
+    def __init__(self, api: client.CoreV1Api, namespace=None, label_selector=LABEL_SELECTOR, timeout=600):
+        """
+        :param api: CoreV1Api (see api_client())
+        :param namespace: namespace of the pods (None to watch all namespaces, which
+                          requires cluster wide permissions)
+        :param label_selector:
+        :param timeout: server side timeout of the watch in seconds
+        """
+        super(PodWatcher, self).__init__(daemon=True)
+        self.api = api
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.timeout = timeout
+        self.error = None
+        self._watch = watch.Watch()
+        self._ready = set()
+        self._changed = threading.Condition()
+        self._finished = False
+
+        # Time (time.monotonic()) the set of ready pods last changed
+        self.ready_changed_at = None
+
+    def run(self):
+        if self.namespace:
+            kwargs = dict(namespace=self.namespace)
+            list_pods = self.api.list_namespaced_pod
+        else:
+            kwargs = dict()
+            list_pods = self.api.list_pod_for_all_namespaces
+
+        try:
+            for event in self._watch.stream(list_pods, label_selector=self.label_selector,
+                                            timeout_seconds=int(self.timeout), **kwargs):
+                pod = event['object']
+                name = pod.metadata.name
+                with self._changed:
+                    ready = set(self._ready)
+                    if event['type'] != 'DELETED' and is_pod_ready(pod):
+                        self._ready.add(name)
+                    else:
+                        self._ready.discard(name)
+                    if ready != self._ready:
+                        self.ready_changed_at = time.monotonic()
+                    self._changed.notify_all()
+                logger.debug("Pod %s %s (ready pods: %d)" % (name, event['type'], len(self._ready)))
+        except Exception as ex:
+            logger.error("Pod watch failed: %s" % ex)
+            self.error = ex
+        finally:
+            with self._changed:
+                self._finished = True
+                self._changed.notify_all()
+
+    @property
+    def ready_pods(self):
+        with self._changed:
+            return set(self._ready)
+
+    def wait_ready(self, replicas, timeout):
+        """
+        Blocks till exactly the given number of pods are ready, the watch ends or the timeout expires.
+        :param replicas:
+        :param timeout:
+        :return: True if the expected number of pods is ready
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self._ready) == replicas or self._finished, timeout) \
+                and len(self._ready) == replicas
+
+    def stop(self):
+        self._watch.stop()
+
+
+def node_count(query: RouterQuery):
+    return len(query.node())
+
+
+class MeshMonitor(object):
+    """
+    Monitors the router mesh while it changes (i.e. being scaled): router pods are
+    watched and the router management is polled (in a background thread) from the
+    moment the monitor is started till the expected mesh is formed or the deadline
+    is reached, so the availability of the router management covers the whole transition.
+
+    Mesh is considered formed once the expected number of pods is ready (or the pod
+    watch failed) and the router reports the expected number of nodes.
+    """
+    def __init__(self, router, api: client.CoreV1Api, replicas, expected_nodes, timeout, namespace,
+                 poll_interval=0.5):
+        """
+        :param router: router used to query the number of nodes
+        :param api: CoreV1Api of the cluster where router pods are watched
+        :param replicas: number of router pods expected
+        :param expected_nodes: number of nodes expected in the mesh
+        :param timeout: overall deadline in seconds (from start())
+        :param namespace: namespace of the router pods (see current_namespace())
+        :param poll_interval: seconds between management queries
+        """
+        self.router = router
+        self.replicas = replicas
+        self.expected_nodes = expected_nodes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.started = None
+        self.node_count = None
+        self.mesh_formed_time = None
+        self.polls = 0
+        self.failed_polls = 0
+        self._watcher = PodWatcher(api, namespace=namespace, timeout=timeout)
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._changed = threading.Condition()
+        self._finished = threading.Event()
+
+    def start(self):
+        """
+        Starts watching the router pods and polling the router management.
+        :return:
+        """
+        self.started = time.monotonic()
+        self._watcher.start()
+        self._poller.start()
+        return self
+
+    def _pods_ready(self):
+        return len(self._watcher.ready_pods) == self.replicas or self._watcher.error is not None
+
+    def _poll(self):
+        query, nodes = None, None
+        while not self._finished.is_set():
+            self.polls += 1
+            try:
+                query = query or RouterQuery(host=self.router.node.ip, port=self.router.port, router=self.router)
+                nodes = node_count(query)
+            except Exception as ex:
+                logger.debug("Unable to query router nodes: %s" % ex)
+                query, nodes = None, None
+                self.failed_polls += 1
+
+            with self._changed:
+                self.node_count = nodes
+                if self.mesh_formed_time is None and nodes == self.expected_nodes and self._pods_ready():
+                    self.mesh_formed_time = time.monotonic() - self.started
+                    logger.info("Mesh with %d nodes formed after %.3f seconds" % (nodes, self.mesh_formed_time))
+                    self._changed.notify_all()
+                    return
+
+            self._finished.wait(self.poll_interval)
+
+    def wait(self) -> MeshReadiness:
+        """
+        Blocks till the mesh is formed or the deadline is reached, then stops monitoring.
+        :return: MeshReadiness
+        """
+        deadline = self.started + self.timeout
+        try:
+            pods_ready = self._watcher.wait_ready(self.replicas, max(deadline - time.monotonic(), 0))
+            ready_pods = self._watcher.ready_pods
+            # Pods may have become ready before this wait started (i.e. while being scaled)
+            pods_ready_time = (self._watcher.ready_changed_at or self.started) - self.started if pods_ready else None
+            logger.info("Router pods ready: %s (%d of %d) after %s seconds"
+                        % (sorted(ready_pods), len(ready_pods), self.replicas, pods_ready_time))
+
+            with self._changed:
+                self._changed.wait_for(lambda: self.mesh_formed_time is not None,
+                                       max(deadline - time.monotonic(), 0))
+        finally:
+            self.stop()
+
+        if self.mesh_formed_time is None:
+            logger.warning("Mesh not formed after %.3f seconds (nodes: %s, expected: %d)"
+                           % (time.monotonic() - self.started, self.node_count, self.expected_nodes))
+        return MeshReadiness(self.mesh_formed_time is not None, pods_ready_time, self.mesh_formed_time,
+                             ready_pods, self.node_count, self.polls, self.failed_polls)
+
+    def stop(self):
+        self._finished.set()
+        self._watcher.stop()
+        self._poller.join()
+
+
+def wait_for_mesh(router, api: client.CoreV1Api, replicas, expected_nodes, timeout, namespace,
+                  poll_interval=0.5):
+    """
+    Waits till the given number of router pods are ready (pod watch) and the router
+    management reports the expected number of nodes (or till the deadline is reached).
+    See MeshMonitor.
+    :param router: router used to query the number of nodes
+    :param api: CoreV1Api of the cluster where router pods are watched
+    :param replicas: number of router pods expected
+    :param expected_nodes: number of nodes expected in the mesh
+    :param timeout: overall deadline in seconds
+    :param namespace: namespace of the router pods (see current_namespace())
+    :param poll_interval: seconds between management queries
+    :return: MeshReadiness
+    """
+    return MeshMonitor(router, api, replicas, expected_nodes, timeout, namespace, poll_interval).start().wait()
+
+
+def validate_mesh_size(router_cluster, replicas: int, new_size: int, timeout, namespace: str = None) -> MeshReadiness:
+    """
+    Asserts that router topology size matches "new_size" value, waiting (up to timeout seconds)
+    till the expected number of router PODs (replicas) is ready and the mesh is formed.
+    :param router_cluster: (router, cluster, token)
+    :param replicas:
+    :param new_size:
+    :param timeout:
+    :param namespace: namespace of the router pods (defaults to the current oc project)
+    :return: MeshReadiness
+    """
+    router, cluster, token = router_cluster
+    server = 'https://%s:8443' % cluster
+    readiness = wait_for_mesh(router, api_client(server, token), replicas, new_size, timeout,
+                              namespace=namespace or current_namespace(router, server, token))
+    assert readiness.ready, "Mesh size is %s (expected: %d)" % (readiness.node_count, new_size)
+    return readiness
+
+
+def record_mesh_readiness(node, results):
+    """
+    Records the pods ready and mesh formation times of each cluster as properties of the test.
+    :param node: test item (request.node)
+    :param results: list of ClusterResult whose value is the MeshReadiness (see validate_mesh_size())
+    :return:
+    """
+    for result in results:
+        if result.value is not None:
+            node.user_properties.append(('pods_ready_time[%s]' % result.cluster, result.value.pods_ready_time))
+            node.user_properties.append(('mesh_formation_time[%s]' % result.cluster, result.value.mesh_formed_time))
@@ -1,54 +1,46 @@
-import time
-from typing import Tuple
+from typing import List, Tuple
 from messaging_components.routers import Dispatch
-from messaging_components.routers.dispatch.management import RouterQuery
-from iqa_common.utils.openshift_util import OpenShiftUtil
+
+from .clusters import failed, run_on_clusters, scale_all
+from .mesh_readiness import record_mesh_readiness, validate_mesh_size
 
 MESH_SIZE = 3
 
+# Maximum time (seconds) for the router mesh to be formed
+MESH_TIMEOUT = 600
+
 
-def test_scale_up_router(router_cluster: Tuple[Dispatch, str, str]):
+def test_scale_up_router(router_clusters: List[Tuple[Dispatch, str, str]]):
     """
-    Executes "oc" command to scale up the number of PODs according to value defined in MESH_SIZE constant.
+    Executes "oc" command to scale up the number of PODs according to value defined in MESH_SIZE constant,
+    on all clusters concurrently.
     It also uses 'amq-interconnect' as the deployment config name (standard in official templates).
 
-    Test passes if command is executed without errors.
+    Test passes if command is executed without errors on all clusters.
     Note: the oc command expects that current session is logged to Openshift cluster (you can do it manually,
           but it will be also done through the CI job).
-    :param router_cluster:
+    :param router_clusters:
     :return:
     """
+    results = scale_all(router_clusters, MESH_SIZE, 'amq-interconnect')
+    assert not failed(results), "Unable to scale up clusters: %s" % failed(results)
 
-    router: Dispatch = router_cluster[0]
-    cluster: str = router_cluster[1]
-    token: str = router_cluster[2]
-
-    # OCP Instance
-    ocp = OpenShiftUtil(router.executor, 'https://%s:8443' % cluster, token)
-
-    execution = ocp.scale(MESH_SIZE, 'amq-interconnect')
-    assert execution.completed_successfully()
 
-
-def test_router_mesh_after_scale_up(router_cluster: Tuple[Dispatch, str, str], iqa):
+def test_router_mesh_after_scale_up(router_clusters: List[Tuple[Dispatch, str, str]], iqa, request):
     """
-    Queries Router for all Node Entities available in the topology.
+    Queries Router for all Node Entities available in the topology (all clusters in parallel).
     It expects the number of nodes matches number of PODs (mesh is correctly formed).
-    :param router_cluster:
+    The time it took for the mesh to be formed on each cluster is recorded as a test property.
+    :param router_clusters:
+    :param iqa:
+    :param request:
     :return:
     """
-    router: Dispatch = router_cluster[0]
-    validate_mesh_size(router, MESH_SIZE * len(iqa.get_routers()))
+    namespace = request.config.option.namespace
+    results = run_on_clusters(router_clusters,
+                              lambda rc: validate_mesh_size(rc, MESH_SIZE, MESH_SIZE * len(iqa.get_routers()),
+                                                            MESH_TIMEOUT, namespace))
 
+    record_mesh_readiness(request.node, results)
+    assert not failed(results), "Mesh not formed on clusters: %s" % failed(results)
 
-def validate_mesh_size(router: Dispatch, new_size: int):
-    """
-    Asserts that router topology size matches "new_size" value.
-    :param router:
-    :param new_size:
-    :return:
-    """
-    time.sleep(90)
-    query = RouterQuery(host=router.node.ip, port=router.port, router=router)
-    node_list = query.node()
-    assert len(node_list) == new_size
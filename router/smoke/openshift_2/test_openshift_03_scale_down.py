@@ -1,47 +1,38 @@
-import time
-from messaging_components.routers import Dispatch
-from messaging_components.routers.dispatch.management import RouterQuery
-from iqa_common.executor import Command, Execution
-from iqa_common.utils.openshift_util import OpenShiftUtil
+from .clusters import failed, run_on_clusters, scale_all
+from .mesh_readiness import record_mesh_readiness, validate_mesh_size
 
 MESH_SIZE = 3
 
+# Maximum time (seconds) for the router mesh to be formed
+MESH_TIMEOUT = 600
 
-def test_scale_down_router(router_cluster):
+
+def test_scale_down_router(router_clusters):
     """
-    Scale down the number of PODs to 1.
-    Expects that the scale down command completes successfully.
-    :param router_cluster:
+    Scale down the number of PODs to 1 on all clusters concurrently.
+    Expects that the scale down command completes successfully on all clusters.
+    :param router_clusters:
     :return:
     """
-    router: Dispatch = router_cluster[0]
-    cluster: str = router_cluster[1]
-    token: str = router_cluster[2]
-
-    # OCP Instance
-    ocp = OpenShiftUtil(router.executor, 'https://%s:8443' % cluster, token)
-    execution: Execution = ocp.scale(1, 'amq-interconnect')
-    assert execution.completed_successfully()
+    results = scale_all(router_clusters, 1, 'amq-interconnect')
+    assert not failed(results), "Unable to scale down clusters: %s" % failed(results)
 
 
-def test_mesh_after_scale_down(router_cluster, iqa):
+def test_mesh_after_scale_down(router_clusters, iqa, request):
     """
-    Queries the router to validate that the number of Nodes in the topology is 1.
-    :param router_cluster:
+    Queries the router of each cluster (in parallel) to validate that the number of Nodes in the topology
+    matches the number of clusters (1 POD each).
+    The time it took for the mesh to be formed on each cluster is recorded as a test property.
+    :param router_clusters:
+    :param iqa:
+    :param request:
     :return:
     """
-    router: Dispatch = router_cluster[0]
-    validate_mesh_size(router, 1 * len(iqa.get_routers()))
+    namespace = request.config.option.namespace
+    results = run_on_clusters(router_clusters,
+                              lambda rc: validate_mesh_size(rc, 1, 1 * len(iqa.get_routers()), MESH_TIMEOUT,
+                                                            namespace))
 
+    record_mesh_readiness(request.node, results)
+    assert not failed(results), "Mesh not formed on clusters: %s" % failed(results)
 
-def validate_mesh_size(router_cluster: Dispatch, new_size: int):
-    """
-    Asserts that router topology size matches "new_size" value.
-    :param router_cluster:
-    :param new_size:
-    :return:
-    """
-    time.sleep(90)
-    query = RouterQuery(host=router_cluster.node.ip, port=router_cluster.port, router=router_cluster)
-    node_list = query.node()
-    assert len(node_list) == new_size
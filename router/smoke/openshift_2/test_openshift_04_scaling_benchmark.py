@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+from typing import List, Tuple
+
+import pytest
+from messaging_components.routers import Dispatch
+
+from .clusters import failed, run_on_clusters, scale_all
+from .mesh_readiness import DEPLOYMENT_CONFIG, MeshMonitor, api_client, current_namespace, current_replicas
+
+# Maximum time (seconds) for the router mesh to be formed on each step
+MESH_TIMEOUT = 600
+
+
+def replica_series(config):
+    """
+    Returns the replica counts given through --scaling-series (i.e. "1,2,4,8").
+    :param config:
+    :return:
+    """
+    return [int(replicas) for replicas in config.option.scaling_series.split(',') if replicas.strip()]
+
+
+def test_mesh_scaling_curve(router_clusters: List[Tuple[Dispatch, str, str]], request):
+    """
+    Scales the 'amq-interconnect' deployment config through the replica series given
+    by --scaling-series, on all clusters concurrently. For each step it records (per cluster)
+    the time it took for the router PODs to be ready and for the full mesh to be formed,
+    along with the availability of the router management (fraction of node queries answered)
+    during the whole transition (monitoring starts right before the scale command).
+
+    The scaling curve of each cluster is recorded as a test property and, if --scaling-results
+    is given, written to scaling-<cluster>.json in that directory.
+    Deployment config of each cluster is scaled back to the replicas it had before the test.
+    :param router_clusters:
+    :param request:
+    :return:
+    """
+    if not request.config.option.scaling_series:
+        pytest.skip("Scaling benchmark runs only when --scaling-series is given")
+
+    namespaces = {cluster: request.config.option.namespace or
+                  current_namespace(router, 'https://%s:8443' % cluster, token)
+                  for router, cluster, token in router_clusters}
+    initial_replicas = {cluster: current_replicas(router, 'https://%s:8443' % cluster, token, namespaces[cluster])
+                        for router, cluster, token in router_clusters}
+    curves = {cluster: [] for _, cluster, _ in router_clusters}
+
+    try:
+        for replicas in replica_series(request.config):
+            expected_nodes = replicas * len(router_clusters)
+            monitors = {cluster: MeshMonitor(router, api_client('https://%s:8443' % cluster, token), replicas,
+                                             expected_nodes, MESH_TIMEOUT, namespaces[cluster]).start()
+                        for router, cluster, token in router_clusters}
+
+            results = scale_all(router_clusters, replicas, DEPLOYMENT_CONFIG)
+            scale_times = {result.cluster: result.elapsed for result in results}
+            if failed(results):
+                for monitor in monitors.values():
+                    monitor.stop()
+                pytest.fail("Unable to scale to %d replicas: %s" % (replicas, failed(results)))
+
+            results = run_on_clusters(router_clusters, lambda rc: monitors[rc[1]].wait())
+
+            not_formed = {}
+            for result in results:
+                readiness = result.value
+                if readiness is None:
+                    not_formed[result.cluster] = str(result.error)
+                    continue
+
+                step = {
+                    'replicas': replicas,
+                    'scale_time': scale_times[result.cluster],
+                    'pods_ready_time': readiness.pods_ready_time,
+                    'mesh_formation_time': readiness.mesh_formed_time,
+                    'node_count': readiness.node_count,
+                    'availability': 1.0 - float(readiness.failed_polls) / readiness.polls,
+                }
+                curves[result.cluster].append(step)
+                logging.info("Cluster %s scaled to %d replicas: %s" % (result.cluster, replicas, step))
+
+                if not readiness.ready:
+                    not_formed[result.cluster] = "Mesh size is %s (expected: %d)" \
+                                                 % (readiness.node_count, expected_nodes)
+
+            assert not not_formed, "Mesh not formed with %d replicas on clusters: %s" % (replicas, not_formed)
+    finally:
+        for cluster, curve in curves.items():
+            request.node.user_properties.append(('scaling_curve[%s]' % cluster, curve))
+            if request.config.option.scaling_results:
+                write_curve(request.config.option.scaling_results, cluster, curve)
+
+        results = scale_all(router_clusters, initial_replicas, DEPLOYMENT_CONFIG)
+        if failed(results):
+            logging.error("Unable to scale back to %s replicas: %s" % (initial_replicas, failed(results)))
+
+
+def write_curve(directory: str, cluster: str, curve: list):
+    """
+    Writes the scaling curve of the given cluster as JSON.
+    :param directory:
+    :param cluster:
+    :param curve:
+    :return:
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'scaling-%s.json' % cluster)
+    with open(path, 'w') as results:
+        json.dump({'cluster': cluster, 'steps': curve}, results, indent=2)
+    logging.info("Scaling curve of %s written to %s" % (cluster, path))
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('proton')
+pytest.importorskip('iqa_common')
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3 import aio
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.completion import Completion
+
+URL = 'amqp://127.0.0.1:5672/queue'
+
+# Maximum time (seconds) for an awaited call that must not hang
+TIMEOUT = 5
+
+
+class StubSender(Completion):
+    """
+    Stands for the Proton sender: each request is acknowledged (from another thread)
+    right away, unless ignore_requests is set, in which case the sender stops without
+    processing it (as when it is stopping while the request is issued).
+    """
+    ignore_requests = False
+
+    def __init__(self, loop, url, sender_id, **kwargs):
+        self._init_completion()
+        self._loop = loop
+        self._stopped = False
+        self.timed_out = False
+        self.accepted = 0
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def start(self):
+        self._notify_attached()
+
+    def request(self, count, future):
+        if StubSender.ignore_requests:
+            threading.Thread(target=self.close).start()
+            return
+
+        def acknowledge():
+            self.accepted += count
+            self._loop.call_soon_threadsafe(aio._resolve, future, self.accepted)
+        threading.Thread(target=acknowledge).start()
+
+    def close(self):
+        self._stopped = True
+        self._notify_done()
+
+
+class StubReceiver(Completion):
+    """
+    Stands for the Proton receiver: once started, it delivers message_count messages
+    (0, 1, ...) from another thread and stops.
+    """
+    def __init__(self, loop, queue, url, message_count, **kwargs):
+        self._init_completion()
+        self._loop = loop
+        self._queue = queue
+        self._stopped = False
+        self.message_count = message_count
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def start(self):
+        threading.Thread(target=self._receive).start()
+
+    def _receive(self):
+        self._notify_attached()
+        for message in range(self.message_count):
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+        self.close()
+
+    def close(self):
+        self._stopped = True
+        self._notify_done()
+
+
+@pytest.fixture(autouse=True)
+def stub_clients(monkeypatch):
+    monkeypatch.setattr(aio, '_AsyncioSender', StubSender)
+    monkeypatch.setattr(aio, '_AsyncioReceiver', StubReceiver)
+    monkeypatch.setattr(StubSender, 'ignore_requests', False)
+
+
+def _run(scenario):
+    """
+    Runs the given scenario (coroutine function receiving the loop) in a new loop,
+    which is not the default one.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(scenario(loop), TIMEOUT))
+    finally:
+        loop.close()
+
+
+def test_send():
+    async def scenario(loop):
+        async with aio.AsyncSender(URL, sender_id='sender', loop=loop) as sender:
+            return [await sender.send(10), await sender.send(5)]
+
+    assert _run(scenario) == [10, 15]
+
+
+def test_send_after_stop_fails():
+    async def scenario(loop):
+        sender = aio.AsyncSender(URL, sender_id='sender', loop=loop).start()
+        await sender.close()
+        await sender.send(1)
+
+    with pytest.raises(ConnectionError):
+        _run(scenario)
+
+
+def test_send_while_stopping_fails(monkeypatch):
+    monkeypatch.setattr(StubSender, 'ignore_requests', True)
+
+    async def scenario(loop):
+        sender = aio.AsyncSender(URL, sender_id='sender', loop=loop).start()
+        await sender.send(1)
+
+    with pytest.raises(ConnectionError):
+        _run(scenario)
+
+
+def test_receive():
+    async def scenario(loop):
+        async with aio.AsyncReceiver(URL, message_count=3, loop=loop) as receiver:
+            messages = [message async for message in receiver]
+            # Iteration remains finished
+            messages += [message async for message in receiver]
+        return messages
+
+    assert _run(scenario) == [0, 1, 2]
+
+
+def test_gather_completion():
+    async def scenario(loop):
+        sender = aio.AsyncSender(URL, sender_id='sender', loop=loop).start()
+        receiver = aio.AsyncReceiver(URL, message_count=2, loop=loop).start()
+        await sender.send(2)
+        await sender.close()
+        return await asyncio.gather(sender.wait(), receiver.wait())
+
+    sender, receiver = _run(scenario)
+    assert sender.accepted == 2
+    assert receiver.stopped
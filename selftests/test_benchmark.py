@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from integration.benchmark import BenchmarkMetrics
+
+pytest_plugins = ['pytester']
+
+CONFTEST = """
+from integration import benchmark
+
+
+def pytest_addoption(parser):
+    benchmark.add_options(parser)
+
+
+def pytest_configure(config):
+    benchmark.register(config, 'topology')
+"""
+
+TEST = """
+def test_throughput(benchmark_metrics):
+    benchmark_metrics.record('throughput', %s, unit='msg/s')
+"""
+
+
+def _metrics(value, higher_is_better=True, tolerance=None):
+    metrics = BenchmarkMetrics('topology', 'test_throughput', {})
+    metrics.record('throughput', value, higher_is_better=higher_is_better, tolerance=tolerance)
+    return metrics
+
+
+def _baseline(value):
+    return {'metrics': {'throughput': {'value': value}}}
+
+
+@pytest.mark.parametrize('value,higher_is_better,regressed', [
+    (91.0, True, False),
+    (89.0, True, True),
+    (109.0, False, False),
+    (111.0, False, True),
+])
+def test_regressions_within_tolerance(value, higher_is_better, regressed):
+    metrics = _metrics(value, higher_is_better)
+    assert bool(metrics.regressions(_baseline(100.0), 10.0)) == regressed
+
+
+def test_regressions_metric_tolerance_overrides_default():
+    assert not _metrics(85.0, tolerance=20.0).regressions(_baseline(100.0), 10.0)
+    assert _metrics(95.0, tolerance=1.0).regressions(_baseline(100.0), 10.0)
+
+
+def test_regressions_ignore_metrics_missing_in_baseline():
+    assert not _metrics(1.0).regressions({'metrics': {}}, 10.0)
+
+
+def test_none_values_not_recorded():
+    assert not _metrics(None).metrics
+
+
+def _run(pytester, value, baseline_value, *args):
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(test_throughput=TEST % value)
+    baseline = pytester.path / 'baseline.json'
+    baseline.write_text(json.dumps({'results': {'topology::test_throughput.py::test_throughput':
+                                                _baseline(baseline_value)}}))
+    results = pytester.path / 'results.json'
+    return pytester.runpytest('--benchmark-baseline=%s' % baseline, '--benchmark-results=%s' % results,
+                              *args), results
+
+
+def test_regression_fails_test_call(pytester):
+    result, _ = _run(pytester, 50.0, 100.0, '--benchmark-regression=fail')
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['*Performance regression*throughput: 50.0*'])
+
+
+def test_regression_warns_by_default(pytester):
+    result, _ = _run(pytester, 50.0, 100.0)
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['*BenchmarkRegressionWarning*'])
+
+
+def test_results_written_without_regression(pytester):
+    result, results = _run(pytester, 100.0, 100.0, '--benchmark-regression=fail')
+    result.assert_outcomes(passed=1)
+    stored = json.loads(results.read_text())['results']
+    assert stored['topology::test_throughput.py::test_throughput']['metrics']['throughput']['value'] == 100.0
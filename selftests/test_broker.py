@@ -1,3 +1,7 @@
+import pytest
+
+pytest.importorskip('messaging_components')
+
 from messaging_components.brokers import Broker
 from messaging_components.node import Node
 
@@ -0,0 +1,66 @@
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.capacity import ProbeResult, Slo, find_knee
+
+
+class FakeLatency(object):
+    def __init__(self, value):
+        self.value = value
+
+    def percentile(self, percentile):
+        return self.value
+
+
+def measure(capacity):
+    """
+    Returns a probe for a path that loses 10% of the messages above the given capacity.
+    """
+    def probe(rate):
+        sent = int(rate * 10)
+        received = sent if rate <= capacity else int(sent * 0.9)
+        return ProbeResult(rate, sent, received, None, False)
+    return probe
+
+
+@pytest.mark.parametrize('capacity', [150, 1000, 7777])
+def test_knee_within_resolution(capacity):
+    knee = find_knee(measure(capacity), Slo(), 100, 20000, resolution=0.05, max_steps=32)
+    assert capacity / 1.05 <= knee.rate <= capacity
+    assert all((step.reason is None) == (step.rate <= capacity) for step in knee.steps)
+
+
+def test_ramp_doubles_rate_till_breach():
+    knee = find_knee(measure(1000), Slo(), 100, 20000)
+    assert [step.rate for step in knee.steps[:5]] == [100, 200, 400, 800, 1600]
+    assert knee.steps[4].reason == 'loss (1600 of 16000)'
+
+
+def test_ramp_stops_at_high():
+    knee = find_knee(measure(10 ** 6), Slo(), 100, 1000)
+    assert knee.rate == 1000
+    assert [step.rate for step in knee.steps] == [100, 200, 400, 800, 1000]
+
+
+def test_slo_breached_at_low():
+    knee = find_knee(measure(50), Slo(), 100, 20000)
+    assert knee.rate is None
+    assert len(knee.steps) == 1
+
+
+def test_max_steps():
+    knee = find_knee(measure(1000), Slo(), 100, 20000, resolution=0.0001, max_steps=8)
+    assert len(knee.steps) == 8
+    assert knee.rate <= 1000
+
+
+@pytest.mark.parametrize('result,slo,reason', [
+    (ProbeResult(100, 1000, 1000, None, True), Slo(), 'timeout'),
+    (ProbeResult(100, 1000, 1000, None, True), Slo(allow_timeout=True), None),
+    (ProbeResult(100, 1000, 990, None, False), Slo(max_loss=0.01), None),
+    (ProbeResult(100, 1000, 989, None, False), Slo(max_loss=0.01), 'loss (11 of 1000)'),
+    (ProbeResult(100, 1000, 1000, FakeLatency(0.5), False), Slo(max_latency=1.0), None),
+    (ProbeResult(100, 1000, 1000, FakeLatency(2.0), False), Slo(max_latency=1.0), 'latency p99 = 2.0'),
+    (ProbeResult(100, 1000, 1000, None, False), Slo(max_latency=1.0), 'latency p99 = None'),
+])
+def test_slo_breach(result, slo, reason):
+    assert slo.breach(result) == reason
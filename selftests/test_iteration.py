@@ -1,3 +1,7 @@
+import pytest
+
+pytest.importorskip('messaging_abstract')
+
 from messaging_abstract.client import Sender, Receiver
 from messaging_abstract.broker import Broker
 from messaging_abstract.router import Router
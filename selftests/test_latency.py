@@ -0,0 +1,96 @@
+import json
+import math
+
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.latency import LatencyHistogram, merge_by_source, to_json
+
+
+def _histogram(values, **kwargs):
+    histogram = LatencyHistogram(**kwargs)
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def test_empty():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    assert histogram.mean is None
+    assert histogram.summary() == {'count': 0, 'min': None, 'mean': None, 'max': None,
+                                   'p50': None, 'p99': None, 'p99.9': None}
+
+
+@pytest.mark.parametrize('percentile', [1, 50, 90, 99, 99.9])
+def test_percentile_relative_error(percentile):
+    values = [0.0001 * 1.01 ** i for i in range(1000)]
+    histogram = _histogram(values)
+    exact = sorted(values)[math.ceil(len(values) * percentile / 100.0) - 1]
+    assert exact <= histogram.percentile(percentile) <= exact * 2 ** (1.0 / histogram.sub_buckets) * 1.01
+
+
+def test_percentile_bounded_by_max():
+    histogram = _histogram([0.5] * 10)
+    assert histogram.percentile(100) == 0.5
+    assert histogram.percentile(0) == 0.5
+
+
+def test_values_below_min_value():
+    histogram = _histogram([0.0, -1.0, 1e-9])
+    assert histogram.buckets == {0: 3}
+    assert histogram.min == 0.0
+    assert histogram.percentile(99) == 1e-9
+
+
+def test_summary():
+    histogram = _histogram([0.001, 0.002, 0.003])
+    summary = histogram.summary()
+    assert summary['count'] == 3
+    assert summary['min'] == 0.001
+    assert summary['max'] == 0.003
+    assert summary['mean'] == pytest.approx(0.002)
+
+
+def test_merge():
+    first = _histogram([0.001, 0.002])
+    second = _histogram([0.002, 0.5])
+    merged = LatencyHistogram().merge(first).merge(second)
+
+    assert merged.count == 4
+    assert merged.min == 0.001
+    assert merged.max == 0.5
+    assert merged.total == pytest.approx(0.505)
+    assert merged.buckets[first._bucket(0.002)] == 2
+    assert merged.percentile(50) == merged._bucket_value(merged._bucket(0.002))
+    assert merged.summary() == _histogram([0.001, 0.002, 0.002, 0.5]).summary()
+
+
+def test_merge_empty():
+    histogram = _histogram([0.1])
+    assert histogram.merge(LatencyHistogram()).summary() == _histogram([0.1]).summary()
+    assert LatencyHistogram().merge(histogram).min == 0.1
+
+
+def test_merge_different_layouts():
+    with pytest.raises(ValueError):
+        LatencyHistogram(sub_buckets=16).merge(LatencyHistogram(sub_buckets=8))
+
+
+def test_dict_round_trip():
+    histogram = _histogram([0.0001 * 1.5 ** i for i in range(20)], sub_buckets=8)
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+
+    assert restored.buckets == histogram.buckets
+    assert (restored.sub_buckets, restored.min_value) == (8, histogram.min_value)
+    assert restored.summary() == histogram.summary()
+    assert restored.to_dict() == histogram.to_dict()
+
+
+def test_merge_by_source():
+    merged = merge_by_source([{'sender-1': _histogram([0.1]), 'sender-2': _histogram([0.2])},
+                              {'sender-1': _histogram([0.3])}])
+
+    assert sorted(merged) == ['sender-1', 'sender-2']
+    assert merged['sender-1'].count == 2
+    assert merged['sender-1'].max == 0.3
+    assert json.loads(to_json(merged))['sender-2']['count'] == 1
@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip('messaging_components')
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3 import management
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.management import RouterQueryPool
+
+
+class FakeNode(object):
+    def __init__(self, ip):
+        self.ip = ip
+
+    def get_ip(self):
+        return self.ip
+
+
+class FakeRouter(object):
+    def __init__(self, ip, port=5672):
+        self.node = FakeNode(ip)
+        self.port = port
+
+
+class FakeRouterQuery(object):
+    """
+    Stands for RouterQuery, which opens its management connection when it is
+    created and keeps it open for all subsequent queries (so every instance
+    counts as a connection). failures is the number of queries still to fail.
+    """
+    instances = []
+    failures = 0
+
+    def __init__(self, host, port, router):
+        self.host = host
+        self.closed = False
+        FakeRouterQuery.instances.append(self)
+
+    def node(self):
+        if FakeRouterQuery.failures:
+            FakeRouterQuery.failures -= 1
+            raise ConnectionError('Router unavailable')
+        return [self.host]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_router_query(monkeypatch):
+    monkeypatch.setattr(management, 'RouterQuery', FakeRouterQuery)
+    monkeypatch.setattr(FakeRouterQuery, 'instances', [])
+    monkeypatch.setattr(FakeRouterQuery, 'failures', 0)
+
+
+def test_queries_share_connection():
+    pool = RouterQueryPool()
+    router1, router2 = FakeRouter('10.0.0.1'), FakeRouter('10.0.0.2')
+
+    for _ in range(10):
+        assert pool.client(router1).node() == ['10.0.0.1']
+        assert pool.client(router2).node() == ['10.0.0.2']
+
+    # Without the pool a connection would be opened per query (20)
+    assert len(FakeRouterQuery.instances) == 2
+    assert pool.reconnects == 0
+    assert pool.latency['10.0.0.1:5672']['node'].count == 10
+
+
+def test_failed_query_reconnects():
+    pool = RouterQueryPool()
+    router = FakeRouter('10.0.0.1')
+    pool.client(router).node()
+
+    FakeRouterQuery.failures = 1
+    assert pool.client(router).node() == ['10.0.0.1']
+    assert pool.reconnects == 1
+    assert len(FakeRouterQuery.instances) == 2
+    assert FakeRouterQuery.instances[0].closed
+
+
+def test_retries_exhausted():
+    pool = RouterQueryPool(retries=2)
+    FakeRouterQuery.failures = 3
+
+    with pytest.raises(ConnectionError):
+        pool.client(FakeRouter('10.0.0.1')).node()
+    assert pool.reconnects == 2
+    assert all(query.closed for query in FakeRouterQuery.instances)
+
+
+def test_close():
+    pool = RouterQueryPool()
+    pool.client(FakeRouter('10.0.0.1')).node()
+    pool.client(FakeRouter('10.0.0.1', 5673)).node()
+    pool.close()
+
+    assert [query.closed for query in FakeRouterQuery.instances] == [True, True]
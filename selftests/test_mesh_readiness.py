@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+pytest.importorskip('kubernetes')
+pytest.importorskip('messaging_components')
+
+from router.smoke.openshift_2 import mesh_readiness
+
+NAMESPACE = 'routers'
+PODS_PATH = '/api/v1/namespaces/%s/pods' % NAMESPACE
+
+
+def pod(name, ready=True, deleting=False):
+    metadata = {'name': name, 'namespace': NAMESPACE, 'resourceVersion': '1',
+                'labels': {'deploymentconfig': mesh_readiness.DEPLOYMENT_CONFIG}}
+    if deleting:
+        metadata['deletionTimestamp'] = '2020-01-01T00:00:00Z'
+    return {'kind': 'Pod', 'apiVersion': 'v1', 'metadata': metadata,
+            'status': {'phase': 'Running' if ready else 'Pending',
+                       'conditions': [{'type': 'Ready', 'status': 'True' if ready else 'False'}]}}
+
+
+# Watch event sent by the fake API server after the given delay (seconds)
+Event = namedtuple('Event', ['delay', 'type', 'object'])
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeApiServer(object):
+    """
+    Serves a watch on the router pods (chunked stream of events), keeping the stream
+    open (till closed) if keep_open is set. Any other request is answered with 403.
+    """
+    def __init__(self, events, keep_open=False):
+        self.events = events
+        self.keep_open = keep_open
+        self.paths = []
+        self.closed = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.paths.append(self.path)
+                if not self.path.startswith(PODS_PATH) or 'watch=' not in self.path:
+                    self.send_error(403)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for event in server.events:
+                    if server.closed.wait(event.delay):
+                        return
+                    self._chunk(json.dumps({'type': event.type, 'object': event.object}) + '\n')
+                if server.keep_open:
+                    server.closed.wait()
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _chunk(self, data):
+                data = data.encode('utf-8')
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.closed.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeRouterQuery(object):
+    """
+    Stands for the RouterQuery of the router, reporting the given number of nodes.
+    """
+    nodes = 0
+
+    def __init__(self, host, port, router):
+        pass
+
+    def node(self):
+        return [object()] * FakeRouterQuery.nodes
+
+
+Node = namedtuple('Node', ['ip'])
+Router = namedtuple('Router', ['node', 'port'])
+ROUTER = Router(Node('127.0.0.1'), 5672)
+
+
+def _watcher(server, timeout=10):
+    return mesh_readiness.PodWatcher(mesh_readiness.api_client(server.url, 'token'), namespace=NAMESPACE,
+                                     timeout=timeout)
+
+
+def test_wait_ready_when_pods_become_ready():
+    events = [Event(0, 'ADDED', pod('router-1', ready=False)),
+              Event(0.2, 'MODIFIED', pod('router-1')),
+              Event(0.2, 'ADDED', pod('router-2'))]
+    with FakeApiServer(events, keep_open=True) as server:
+        watcher = _watcher(server)
+        watcher.start()
+        try:
+            assert watcher.wait_ready(2, 5)
+            assert watcher.ready_pods == {'router-1', 'router-2'}
+        finally:
+            watcher.stop()
+    assert all(path.startswith(PODS_PATH) for path in server.paths)
+
+
+def test_wait_ready_timeout():
+    with FakeApiServer([Event(0, 'ADDED', pod('router-1'))], keep_open=True) as server:
+        watcher = _watcher(server)
+        watcher.start()
+        try:
+            started = time.monotonic()
+            assert not watcher.wait_ready(2, 0.5)
+            assert time.monotonic() - started < 5
+        finally:
+            watcher.stop()
+
+
+@pytest.mark.parametrize('last_event', [Event(0, 'DELETED', pod('router-2')),
+                                        Event(0, 'MODIFIED', pod('router-2', deleting=True))])
+def test_wait_ready_after_deletion(last_event):
+    events = [Event(0, 'ADDED', pod('router-1')), Event(0, 'ADDED', pod('router-2')), last_event]
+    with FakeApiServer(events) as server:
+        watcher = _watcher(server)
+        watcher.start()
+        watcher.join(5)
+        assert watcher.error is None
+        assert watcher.ready_pods == {'router-1'}
+        assert not watcher.wait_ready(2, 0.5)
+
+
+def test_wait_for_mesh(monkeypatch):
+    monkeypatch.setattr(mesh_readiness, 'RouterQuery', FakeRouterQuery)
+    monkeypatch.setattr(FakeRouterQuery, 'nodes', 2)
+    events = [Event(0, 'ADDED', pod('router-1')), Event(0.2, 'ADDED', pod('router-2'))]
+    with FakeApiServer(events, keep_open=True) as server:
+        readiness = mesh_readiness.wait_for_mesh(ROUTER, mesh_readiness.api_client(server.url, 'token'), 2, 2,
+                                                 5, NAMESPACE, poll_interval=0.1)
+    assert readiness.ready
+    assert readiness.pods_ready_time is not None
+    assert readiness.mesh_formed_time >= readiness.pods_ready_time
+    assert readiness.node_count == 2
+
+
+def test_wait_for_mesh_timeout(monkeypatch):
+    monkeypatch.setattr(mesh_readiness, 'RouterQuery', FakeRouterQuery)
+    monkeypatch.setattr(FakeRouterQuery, 'nodes', 1)
+    with FakeApiServer([Event(0, 'ADDED', pod('router-1'))], keep_open=True) as server:
+        readiness = mesh_readiness.wait_for_mesh(ROUTER, mesh_readiness.api_client(server.url, 'token'), 2, 2,
+                                                 1, NAMESPACE, poll_interval=0.1)
+    assert not readiness.ready
+    assert readiness.pods_ready_time is None
+    assert readiness.mesh_formed_time is None
+    assert readiness.node_count == 1
+
+
+class UnavailableRouterQuery(FakeRouterQuery):
+    """
+    Router management unavailable (queries fail) for the first second.
+    """
+    available_at = None
+
+    def node(self):
+        if time.monotonic() < UnavailableRouterQuery.available_at:
+            raise IOError("Router unavailable")
+        return super(UnavailableRouterQuery, self).node()
+
+
+def test_mesh_monitor_samples_whole_transition(monkeypatch):
+    monkeypatch.setattr(mesh_readiness, 'RouterQuery', UnavailableRouterQuery)
+    monkeypatch.setattr(FakeRouterQuery, 'nodes', 2)
+    monkeypatch.setattr(UnavailableRouterQuery, 'available_at', time.monotonic() + 1)
+    events = [Event(0, 'ADDED', pod('router-1')), Event(1.5, 'ADDED', pod('router-2'))]
+    with FakeApiServer(events, keep_open=True) as server:
+        monitor = mesh_readiness.MeshMonitor(ROUTER, mesh_readiness.api_client(server.url, 'token'), 2, 2, 5,
+                                             NAMESPACE, poll_interval=0.1).start()
+        # Pods become ready while the caller is still busy (i.e. scaling)
+        time.sleep(2)
+        readiness = monitor.wait()
+    assert readiness.ready
+    assert 1.5 <= readiness.pods_ready_time < 2
+    assert 0 < readiness.failed_polls < readiness.polls
@@ -1,3 +1,7 @@
+import pytest
+
+pytest.importorskip('messaging_abstract')
+
 from messaging_abstract.client import Receiver
 
 
@@ -1,3 +1,7 @@
+import pytest
+
+pytest.importorskip('messaging_components')
+
 from messaging_components.routers.dispatch.dispatch import Dispatch as Router
 
 
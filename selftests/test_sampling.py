@@ -0,0 +1,141 @@
+import csv
+import json
+
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3 import sampling
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.sampling import ThroughputSampler
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.sent = 0
+        self.accepted = 0
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeTask(object):
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeContainer(object):
+    """
+    Keeps the scheduled timer handlers, so timers can be fired by the test.
+    """
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, delay, handler):
+        task = FakeTask()
+        self.scheduled.append((delay, handler, task))
+        return task
+
+    def fire(self):
+        delay, handler, task = self.scheduled.pop(0)
+        if not task.cancelled:
+            handler.on_timer(FakeEvent(self))
+
+
+class FakeEvent(object):
+    def __init__(self, container):
+        self.container = container
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sampling, 'time', clock)
+    return clock
+
+
+def _run(sampler, clock, steps):
+    """
+    Starts the sampler and fires one timer per step (sent, accepted), one second apart.
+    """
+    container = FakeContainer()
+    sampler.start(container)
+    for sent, accepted in steps:
+        clock.now += 1
+        sampler.client.sent, sampler.client.accepted = sent, accepted
+        container.fire()
+    return container
+
+
+def test_samples(clock):
+    sampler = ThroughputSampler(FakeClient(), ['sent', 'accepted'], interval=0.5)
+    container = _run(sampler, clock, [(10, 5), (30, 20)])
+
+    assert sampler.samples() == [(1000.0, {'sent': 0, 'accepted': 0}),
+                                 (1001.0, {'sent': 10, 'accepted': 5}),
+                                 (1002.0, {'sent': 30, 'accepted': 20})]
+    assert [delay for delay, _, _ in container.scheduled] == [0.5]
+
+
+def test_ring_buffer_wraparound(clock):
+    sampler = ThroughputSampler(FakeClient(), ['sent'], capacity=4)
+    _run(sampler, clock, [(count, 0) for count in range(1, 10)])
+
+    # Oldest samples are overwritten, remaining ones are returned oldest first
+    assert [values['sent'] for _, values in sampler.samples()] == [6, 7, 8, 9]
+    assert [ts for ts, _ in sampler.samples()] == [1006.0, 1007.0, 1008.0, 1009.0]
+
+
+def test_rates(clock):
+    sampler = ThroughputSampler(FakeClient(), ['sent', 'accepted'], capacity=3)
+    _run(sampler, clock, [(100, 50), (300, 150), (400, 400)])
+
+    assert sampler.rates() == [{'timestamp': 1002.0, 'elapsed': 1.0, 'sent_rate': 200.0, 'accepted_rate': 100.0},
+                               {'timestamp': 1003.0, 'elapsed': 2.0, 'sent_rate': 100.0, 'accepted_rate': 250.0}]
+
+
+def test_rates_skip_samples_without_elapsed_time(clock):
+    sampler = ThroughputSampler(FakeClient(), ['sent'])
+    container = _run(sampler, clock, [(10, 0)])
+    sampler.client.sent = 20
+    container.fire()
+
+    assert [rate['sent_rate'] for rate in sampler.rates()] == [10.0]
+
+
+def test_stop(clock):
+    sampler = ThroughputSampler(FakeClient(), ['sent'])
+    container = _run(sampler, clock, [(10, 0)])
+    _, _, task = container.scheduled[0]
+
+    sampler.client.sent = 15
+    sampler.stop()
+    assert task.cancelled
+    assert [values['sent'] for _, values in sampler.samples()] == [0, 10, 15]
+
+    # Stopping again (or a late timer) does not take more samples
+    sampler.stop()
+    sampler.on_timer(FakeEvent(container))
+    assert len(sampler.samples()) == 3
+
+
+def test_export(clock, tmpdir):
+    sampler = ThroughputSampler(FakeClient(), ['sent', 'accepted'])
+    _run(sampler, clock, [(10, 5), (30, 20)])
+    sampler.to_csv(str(tmpdir.join('samples.csv')))
+    sampler.to_json(str(tmpdir.join('samples.json')))
+
+    with open(str(tmpdir.join('samples.csv'))) as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [float(row['sent_rate']) for row in rows] == [10.0, 20.0]
+
+    with open(str(tmpdir.join('samples.json'))) as json_file:
+        exported = json.load(json_file)
+    assert exported['interval'] == 0.1
+    assert exported['samples'][-1] == {'timestamp': 1002.0, 'sent': 30, 'accepted': 20}
+    assert exported['rates'] == sampler.rates()
@@ -0,0 +1,83 @@
+import pytest
+
+from integration.int_3Ri_2BhaRi2_3Re_2BhaRe3.sequence import SequenceTracker, NEW, DUPLICATE, REORDERED, LATE, \
+    RESENT
+
+
+def _track(tracker, sequences):
+    return [tracker.track(sequence) for sequence in sequences]
+
+
+def test_in_order():
+    tracker = SequenceTracker()
+    assert _track(tracker, range(10)) == [NEW] * 10
+    assert tracker.summary() == {'highest': 9, 'received': 10, 'lost': 0, 'duplicates': 0,
+                                 'reordered': 0, 'late': 0, 'resent': 0}
+
+
+def test_loss():
+    tracker = SequenceTracker()
+    _track(tracker, [0, 1, 4, 5, 9])
+    assert tracker.lost == 5
+
+
+def test_duplicates():
+    tracker = SequenceTracker()
+    assert _track(tracker, [0, 1, 1, 2, 0]) == [NEW, NEW, DUPLICATE, NEW, DUPLICATE]
+    assert tracker.duplicates == 2
+    assert tracker.lost == 0
+
+
+def test_reordered():
+    tracker = SequenceTracker()
+    assert _track(tracker, [0, 2, 3, 1]) == [NEW, NEW, NEW, REORDERED]
+    assert tracker.reordered == 1
+    assert tracker.lost == 0
+    assert tracker.track(1) == DUPLICATE
+
+
+def test_first_sequence_none_starts_from_first_received():
+    tracker = SequenceTracker(first_sequence=None)
+    _track(tracker, [100, 101])
+    assert tracker.lost == 0
+    assert tracker.highest == 101
+
+
+def test_late():
+    tracker = SequenceTracker(window=8)
+    _track(tracker, [0, 2])
+    _track(tracker, range(3, 20))
+    assert tracker.lost == 1
+
+    # Older than the window, assumed to be the missing one
+    assert tracker.track(1) == LATE
+    assert tracker.late == 1
+    assert tracker.lost == 0
+
+    # Nothing missing anymore, lost is not decremented further
+    assert tracker.track(0) == LATE
+    assert tracker.lost == 0
+
+
+def test_resent_counted_apart_from_reordered_and_late():
+    tracker = SequenceTracker(window=8)
+    _track(tracker, [0, 2, 4])
+    assert tracker.track(2, resent=True) == DUPLICATE
+    assert tracker.track(1, resent=True) == RESENT
+    _track(tracker, range(5, 20))
+    assert tracker.track(3, resent=True) == RESENT
+    assert (tracker.resent, tracker.reordered, tracker.late, tracker.lost) == (2, 0, 0, 0)
+
+
+@pytest.mark.parametrize('jump', [8, 9, 2 ** 64])
+def test_large_jump(jump):
+    tracker = SequenceTracker(window=8)
+    _track(tracker, [0, 1])
+    assert tracker.track(1 + jump) == NEW
+    assert tracker.lost == jump - 1
+    assert tracker._bitmap == 1
+
+    # Window restarts at the new highest sequence
+    assert tracker.track(jump) == REORDERED
+    assert tracker.track(1 + jump) == DUPLICATE
+    assert tracker.track(1) == LATE